@@ -0,0 +1,90 @@
+"""Time per chart with a figure rebuilt for every file versus a reused figure template.
+
+"Rebuilt" creates a fresh template for every chart, which redoes the axes,
+boundary lines, bands, legend and grid like the old per-file pyplot code did;
+"reused" keeps one decorated figure and only swaps the data artists.
+
+Usage:
+    python benchmarks/bench_figure_templates.py [--files 20] [--windows 2000] [--dpi 300]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import image_writer
+from bench_isochore_original import make_isochore_table
+from isochore_plotter import OriginalTemplate, AverageTemplate, HistogramTemplate, rolling_mean
+from chart_generator import WordChartTemplate
+from gc_skew_plotter import SkewTemplate
+
+
+def chart_data(kind, windows, seed):
+    df = make_isochore_table(windows, seed=seed)
+    x, gc = df['Start (Mb)'].to_numpy(), df['GC_Content'].to_numpy()
+    if kind == 'isochore original':
+        return {'x': x, 'gc': gc, 'bar_width': 0.9 * (x[1] - x[0])}
+    if kind == 'isochore moving average':
+        average = rolling_mean(gc, 50)
+        return {'x': x, 'gc': gc, 'average_x': x[25:25 + len(average)], 'average': average,
+                'label': 'Moving Average (50 points)'}
+    if kind == 'isochore histogram':
+        return {'gc': gc}
+    if kind == 'gc skew':
+        rng = np.random.default_rng(seed)
+        return {'starts': np.arange(windows) * 100, 'skew': rng.normal(0, 0.1, windows)}
+    rng = np.random.default_rng(seed)
+    return {'words': [f'W{i:03d}' for i in range(40)], 'counts': rng.integers(20, 500, 40), 'colors': ['green'] * 40}
+
+
+CHARTS = [
+    ('isochore original', OriginalTemplate, {}),
+    ('isochore moving average', AverageTemplate, {'steps': False}),
+    ('isochore histogram', HistogramTemplate, {}),
+    ('gc skew', SkewTemplate, {}),
+    ('word frequency', WordChartTemplate, {}),
+]
+
+
+def time_charts(render, datasets, output_file):
+    start = time.perf_counter()
+    for data in datasets:
+        render(output_file, 'bench', **data)
+    # PNGs are encoded on the writer threads: count that too
+    image_writer.flush()
+    return (time.perf_counter() - start) / len(datasets)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=20, help='charts per chart type')
+    parser.add_argument('--windows', type=int, default=2000, help='points per chart')
+    parser.add_argument('--dpi', type=int, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        output_file = os.path.join(output_dir, 'chart.png')
+        print(f"{'chart':<26} {'rebuilt (ms)':>13} {'reused (ms)':>12} {'speedup':>8}")
+
+        for kind, template_class, options in CHARTS:
+            datasets = [chart_data(kind, args.windows, seed) for seed in range(args.files)]
+
+            def rebuilt(*render_args, **data):
+                template_class(dpi=args.dpi, **options).render(*render_args, **data)
+
+            reused_template = template_class(dpi=args.dpi, **options)
+            before = time_charts(rebuilt, datasets, output_file)
+            after = time_charts(reused_template.render, datasets, output_file)
+            print(f"{kind:<26} {before * 1000:13.1f} {after * 1000:12.1f} {before / after:7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Time IsochorePlotter.plot_original against the old one-bar-per-row loop.
+
+Usage:
+    python benchmarks/bench_isochore_original.py [--sizes 10000 100000 1000000] [--legacy-max N]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import image_writer
+from isochore_plotter import IsochorePlotter, BOUNDARIES, get_gc_class_color
+
+
+def make_isochore_table(windows, window_size=10000, seed=0):
+    rng = np.random.default_rng(seed)
+    gc = np.clip(41 + np.cumsum(rng.normal(0, 0.5, windows)) % 20 - 5 + rng.normal(0, 2, windows), 25, 65)
+    df = pd.DataFrame({'Start': np.arange(windows, dtype=np.int64) * window_size, 'GC_Content': gc})
+    df['Start (Mb)'] = df['Start'] / 1e6
+    return df
+
+
+def legacy_plot_original(df, output_file):
+    # The per-row implementation plot_original replaced, kept here as the baseline
+    plt.figure(figsize=(16, 8))
+
+    colors = [get_gc_class_color(gc) for gc in df['GC_Content']]
+    bar_width = 0.9 * (df['Start (Mb)'].iloc[1] - df['Start (Mb)'].iloc[0]) if len(df) > 1 else 0.1
+
+    for i in range(len(df)):
+        plt.bar(df['Start (Mb)'].iloc[i], df['GC_Content'].iloc[i], width=bar_width,
+                color=colors[i], edgecolor=None, zorder=3)
+
+    for boundary, color, label in BOUNDARIES:
+        plt.axhline(boundary, color=color, linestyle='--', label=label, zorder=2)
+        plt.fill_between(df['Start (Mb)'], boundary, boundary + 5, color=color, alpha=0.1, zorder=1)
+
+    plt.title(f'GC Content - {os.path.basename(output_file)} (Original)')
+    plt.xlabel('Start (Mb)')
+    plt.ylabel('GC Content (%)')
+    plt.legend(loc='upper right')
+    plt.grid(True, zorder=0)
+    plt.savefig(output_file, format='png', dpi=300)
+    plt.close()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    # PNGs are encoded on the writer threads: count that too
+    image_writer.flush()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--legacy-max', type=int, default=None,
+                        help='skip the legacy loop above this many windows (it can take a very long time)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        plotter = IsochorePlotter(output_dir, output_dir)
+        print(f"{'windows':>10} {'legacy (s)':>12} {'vectorized (s)':>15} {'speedup':>9}")
+
+        for size in args.sizes:
+            df = make_isochore_table(size)
+            file = os.path.join(output_dir, f'isochores_output_bench_{size}.csv')
+
+            if args.legacy_max is None or size <= args.legacy_max:
+                legacy = timed(legacy_plot_original, df, os.path.join(output_dir, 'legacy.png'))
+            else:
+                legacy = None
+
+            vectorized = timed(plotter.plot_original, df, file)
+
+            legacy_text = f"{legacy:12.2f}" if legacy is not None else f"{'skipped':>12}"
+            speedup_text = f"{legacy / vectorized:8.1f}x" if legacy is not None else f"{'-':>9}"
+            print(f"{size:>10} {legacy_text} {vectorized:15.2f} {speedup_text}")
+
+
+if __name__ == '__main__':
+    main()
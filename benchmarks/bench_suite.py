@@ -0,0 +1,250 @@
+"""Time every plotter's load, compute and render stages on synthetic data, with stored baselines.
+
+Each scale gets a synthetic dataset (see synthetic_data.py), reused between runs
+from --data-dir. Every plotter runs from scratch into a temporary output
+directory with one job and the instrumentation on, and its stages are folded
+into load / compute / render, plus the image compression done on the writer
+threads (encode), which overlaps rendering and so is kept apart. Throughput is reported as rows/s (table rows the
+plotter reads) and bases/s (genome bases those rows cover).
+
+--save-baseline NAME stores the results in benchmarks/baselines/NAME.json;
+--compare NAME prints the change against it and exits with status 1 when a
+stage got slower than the tolerance allows. Baselines are machine specific,
+so compare against one recorded on the same machine.
+
+Usage:
+    python benchmarks/bench_suite.py [--scales 1mb 10mb] [--plotters words isochore ...] [--repeat 3]
+                                     [--compress none|gzip|bgzf] [--save-baseline NAME] [--compare NAME] [--tolerance 0.2]
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+from contextlib import redirect_stdout
+
+import matplotlib
+matplotlib.use('Agg')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import instrumentation
+from figure_template import clear_templates
+from synthetic_data import SCALES, COMPRESSIONS, parse_scale, ensure_dataset
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'dna_chart_bench')
+
+# Instrumentation stages folded into the reported ones; anything else only counts towards the total
+STAGE_GROUPS = {
+    'load': ('load', 'sequence', 'stream_count'),
+    'compute': ('compute', 'count'),
+    'render': ('draw', 'save', 'render'),
+    'encode': ('encode',),
+}
+# Stages shorter than this are reported but never flagged: timer noise dominates them
+MIN_COMPARE_SECONDS = 0.05
+
+
+def run_words(meta, output_dir):
+    from chart_generator import ChartGenerator
+    ChartGenerator(meta['segments_dir'], output_dir, threshold=20, force=True, use_segment_cache=False).process_files()
+
+
+def run_scatter(meta, output_dir):
+    from scatter_plotter import ScatterPlotter
+    ScatterPlotter(meta['segments_dir'], output_dir, lod='auto', force=True, use_segment_cache=False).process_all()
+
+
+def run_isochore(meta, output_dir):
+    from isochore_plotter import IsochorePlotter
+    IsochorePlotter(meta['isochores_dir'], output_dir, force=True).process_all()
+
+
+def run_isochore_genome(meta, output_dir):
+    from isochore_plotter import IsochorePlotter
+    IsochorePlotter(None, output_dir, sequence_file=meta['genome_file'],
+                    window_size=meta['params']['window_size'], force=True).process_genome()
+
+
+def run_gcskew(meta, output_dir):
+    from gc_skew_plotter import GCSkewPlotter
+    GCSkewPlotter(meta['segments_dir'], output_dir, sequence_file=meta['segment_fasta_file'], force=True,
+                  use_segment_cache=False).process_all()
+
+
+def run_gcskew_cumulative(meta, output_dir):
+    from gc_skew_plotter import GCSkewPlotter
+    GCSkewPlotter(None, output_dir, sequence_file=meta['genome_file'],
+                  window_size=meta['params']['window_size'], force=True).process_cumulative()
+
+
+def segment_workload(counts):
+    # Segment and merged tables both tile the genome
+    return counts['segment_rows'] + counts['merged_rows'], 2 * counts['genome_bases']
+
+
+def genome_workload(counts):
+    return counts['isochore_rows'], counts['genome_bases']
+
+
+# name -> (runner, workload(counts) -> (rows, bases))
+PLOTTERS = {
+    'words': (run_words, segment_workload),
+    'scatter': (run_scatter, segment_workload),
+    'isochore': (run_isochore, genome_workload),
+    'isochore_genome': (run_isochore_genome, genome_workload),
+    'gcskew': (run_gcskew, segment_workload),
+    'gcskew_cumulative': (run_gcskew_cumulative, genome_workload),
+}
+
+
+def group_stages(records):
+    seconds = {group: 0.0 for group in STAGE_GROUPS}
+    for record in records:
+        for group, stages in STAGE_GROUPS.items():
+            if record['stage'] in stages:
+                seconds[group] += record['wall_s']
+    return seconds
+
+
+def run_plotter(name, meta, repeat, verbose=False):
+    """Best (minimum) seconds per stage group and in total over ``repeat`` runs."""
+    runner, _ = PLOTTERS[name]
+    best = None
+    for _ in range(repeat):
+        output_dir = tempfile.mkdtemp(prefix=f'bench_{name}_')
+        instrumentation.reset()
+        clear_templates()
+        try:
+            start = time.perf_counter()
+            if verbose:
+                runner(meta, output_dir)
+            else:
+                with redirect_stdout(io.StringIO()):
+                    runner(meta, output_dir)
+            total = time.perf_counter() - start
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+        seconds = dict(group_stages(instrumentation.records()), total=total)
+        best = seconds if best is None else {key: min(best[key], seconds[key]) for key in best}
+    return best
+
+
+def throughput(seconds, rows, bases):
+    return {
+        stage: {'wall_s': round(wall, 6),
+                'rows_per_s': rows / wall if wall > 0 else None,
+                'bases_per_s': bases / wall if wall > 0 else None}
+        for stage, wall in seconds.items()
+    }
+
+
+def format_rate(rate):
+    if rate is None:
+        return f"{'-':>10}"
+    for factor, unit in ((1e9, 'G'), (1e6, 'M'), (1e3, 'k')):
+        if rate >= factor:
+            return f"{rate / factor:9.2f}{unit}"
+    return f"{rate:10.1f}"
+
+
+def print_results(scale, name, rows, bases, stages):
+    print(f"\n{scale} / {name}: {rows:,} rows, {bases:,} bases")
+    print(f"  {'stage':<8} {'wall (s)':>10} {'rows/s':>10} {'bases/s':>10}")
+    for stage, values in stages.items():
+        print(f"  {stage:<8} {values['wall_s']:10.3f} {format_rate(values['rows_per_s'])} "
+              f"{format_rate(values['bases_per_s'])}")
+
+
+def machine_info():
+    return {'platform': platform.platform(), 'python': platform.python_version(),
+            'processor': platform.processor() or platform.machine(), 'cpus': os.cpu_count()}
+
+
+def baseline_path(name):
+    return name if name.endswith('.json') else os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save_baseline(name, results):
+    path = baseline_path(name)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'machine': machine_info(), 'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': results},
+                  f, indent=2)
+    print(f"\n✅ Baseline saved to {path}")
+
+
+def compare_baseline(name, results, tolerance):
+    """Print current vs. baseline bases/s per stage; returns the regressions."""
+    with open(baseline_path(name), 'r') as f:
+        baseline = json.load(f)
+    if baseline['machine'] != machine_info():
+        print(f"⚠️ Baseline {name} was recorded on a different machine: {baseline['machine']}")
+
+    regressions = []
+    print(f"\nCompared with baseline {name} ({baseline.get('created', '?')}), bases/s:")
+    print(f"  {'scale / plotter / stage':<40} {'baseline':>10} {'current':>10} {'change':>8}")
+    for scale, plotters in results.items():
+        for plotter, entry in plotters.items():
+            for stage, values in entry['stages'].items():
+                old = baseline['results'].get(scale, {}).get(plotter, {}).get('stages', {}).get(stage)
+                if not old or not old['bases_per_s'] or not values['bases_per_s']:
+                    continue
+                change = values['bases_per_s'] / old['bases_per_s'] - 1
+                noisy = min(values['wall_s'], old['wall_s']) < MIN_COMPARE_SECONDS
+                flag = '  ~' if noisy else ('  ❌' if change < -tolerance else '')
+                if flag == '  ❌':
+                    regressions.append((scale, plotter, stage, change))
+                print(f"  {f'{scale} / {plotter} / {stage}':<40} {format_rate(old['bases_per_s'])} "
+                      f"{format_rate(values['bases_per_s'])} {change:+7.1%}{flag}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} stage(s) slower than the {tolerance:.0%} tolerance.")
+    else:
+        print(f"\n✅ No stage slower than the {tolerance:.0%} tolerance.")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', nargs='+', default=['1mb', '10mb'],
+                        help=f"genome sizes: {', '.join(SCALES)} or any '<number>kb/mb/gb'")
+    parser.add_argument('--plotters', nargs='+', choices=list(PLOTTERS), default=list(PLOTTERS))
+    parser.add_argument('--records', type=int, default=4, help='sequences (chromosomes) per synthetic genome')
+    parser.add_argument('--compress', choices=COMPRESSIONS, default='none',
+                        help='compression of the genome FASTA read by isochore_genome and gcskew_cumulative')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per plotter; the fastest is kept')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='where the synthetic datasets are kept')
+    parser.add_argument('--save-baseline', metavar='NAME')
+    parser.add_argument('--compare', metavar='NAME')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown before a stage is flagged')
+    parser.add_argument('--verbose', action='store_true', help="show the plotters' own output")
+    args = parser.parse_args()
+
+    instrumentation.enable()
+    results = {}
+    for scale in args.scales:
+        name = f"{scale}_{args.records}" + ('' if args.compress == 'none' else f"_{args.compress}")
+        meta = ensure_dataset(os.path.join(args.data_dir, name), parse_scale(scale), records=args.records,
+                              segment_fasta='gcskew' in args.plotters, compress=args.compress)
+        results[scale] = {}
+        for name in args.plotters:
+            rows, bases = PLOTTERS[name][1](meta['counts'])
+            stages = throughput(run_plotter(name, meta, args.repeat, args.verbose), rows, bases)
+            results[scale][name] = {'rows': rows, 'bases': bases, 'stages': stages}
+            print_results(scale, name, rows, bases, stages)
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+    if args.compare and compare_baseline(args.compare, results, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
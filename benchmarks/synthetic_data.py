@@ -0,0 +1,277 @@
+"""Synthetic inputs for the benchmarks: a genome FASTA plus the CSVs the plotters read.
+
+A dataset is one directory holding
+    genome.fna                              records chr1..chrN, 60 bases per line
+                                            (genome.fna.gz with --compress gzip or bgzf)
+    segments.fna                            one record per segment, named by its Start (GC skew input)
+    segments/segments_output_<record>.csv   Start, End, Length, Cost, Best Word (genome coordinates)
+    segments/merged_segments_output_<record>.csv
+    isochores/isochores_output_<record>_<window>.csv   Start, GC_Content (record coordinates)
+    dataset.json                            the parameters and row/base counts
+
+GC content drifts between isochore-like domains, so the GC charts have structure
+to draw. Everything is written chunk by chunk, so a 3 GB genome-equivalent only
+needs memory for one record at a time (for segments.fna) and one chunk otherwise.
+
+Usage:
+    python benchmarks/synthetic_data.py OUTPUT_DIR [--scale 10mb] [--records 4] [--compress none] [--seed 0]
+"""
+import os
+import sys
+import gzip
+import math
+import shutil
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from fasta_reader import FastaIndex
+from bgzf import write_bgzf
+
+# Named scales, in bases (genome-equivalents); any '<number>kb/mb/gb' works too
+SCALES = {'1mb': 10**6, '10mb': 10**7, '100mb': 10**8, '1gb': 10**9, '3gb': 3 * 10**9}
+UNITS = {'kb': 10**3, 'mb': 10**6, 'gb': 10**9}
+
+LINE_BASES = 60
+CHUNK_BASES = 8 * 1024 * 1024
+DOMAIN_BASES = 300_000
+DEFAULT_WINDOW_SIZE = 20_000
+DEFAULT_SEGMENT_LENGTH = 500
+DEFAULT_VOCABULARY = 400
+DATASET_META = 'dataset.json'
+COMPRESSIONS = ('none', 'gzip', 'bgzf')
+
+# Codes 0..3 are A/T (AT bases) and G/C; the second bit picks the strand letter
+BASE_LETTERS = np.frombuffer(b'ATGC', dtype=np.uint8)
+
+
+def parse_scale(scale):
+    """'10mb', '3gb', '250kb' or a plain number of bases -> number of bases."""
+    text = str(scale).strip().lower()
+    if text in SCALES:
+        return SCALES[text]
+    for unit, factor in UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(float(text))
+
+
+def record_lengths(genome_bases, records):
+    # Roughly equal records; the first ones absorb the remainder
+    base, extra = divmod(genome_bases, records)
+    return [base + (i < extra) for i in range(records)]
+
+
+def make_vocabulary(size, rng):
+    # DNA words of 3-8 bases with Zipf-like frequencies, like real best-word segmentations
+    words = set()
+    while len(words) < size:
+        length = int(rng.integers(3, 9))
+        words.add(BASE_LETTERS[rng.integers(0, 4, length)].tobytes().decode('ascii'))
+    words = sorted(words)
+    rng.shuffle(words)
+    weights = 1.0 / np.arange(1, size + 1)
+    return np.array(words), weights / weights.sum()
+
+
+def domain_gc(domains, rng):
+    # GC fraction per domain: a random walk folded back into 35%-60%
+    low, span = 0.35, 0.25
+    walk = (0.1 + np.cumsum(rng.normal(0, 0.03, domains))) % (2 * span)
+    return low + np.where(walk > span, 2 * span - walk, walk)
+
+
+def random_bases(length, gc_fraction, offset, rng):
+    # gc_fraction per domain; offset is the position of the first base within the record
+    domains = (offset + np.arange(length)) // DOMAIN_BASES - offset // DOMAIN_BASES
+    is_gc = rng.random(length) < gc_fraction[domains]
+    codes = is_gc.astype(np.uint8) * 2 + (rng.random(length) < 0.5)
+    return BASE_LETTERS[codes]
+
+
+def write_fasta_record(f, name, length, window_size, rng):
+    """Write one record and return its per-window GC content (%)."""
+    f.write(f">{name}\n".encode('ascii'))
+    gc_fraction = domain_gc(length // DOMAIN_BASES + 1, rng)
+    # Whole lines and whole windows per chunk, so neither straddles two chunks
+    step = math.lcm(LINE_BASES, window_size)
+    chunk_size = max(step, CHUNK_BASES // step * step)
+    gc_content = []
+
+    for offset in range(0, length, chunk_size):
+        bases = random_bases(min(chunk_size, length - offset), gc_fraction, offset, rng)
+        is_gc = (bases == ord('G')) | (bases == ord('C'))
+        starts = np.arange(0, len(bases), window_size)
+        gc_content.append(np.add.reduceat(is_gc, starts) * 100 / np.diff(np.append(starts, len(bases))))
+
+        lines = len(bases) // LINE_BASES
+        body = np.full((lines, LINE_BASES + 1), ord('\n'), dtype=np.uint8)
+        body[:, :LINE_BASES] = bases[:lines * LINE_BASES].reshape(lines, LINE_BASES)
+        f.write(body.tobytes())
+        if len(bases) % LINE_BASES:
+            f.write(bases[lines * LINE_BASES:].tobytes() + b'\n')
+
+    return np.concatenate(gc_content) if gc_content else np.empty(0)
+
+
+def make_segments(length, offset, mean_length, vocabulary, rng):
+    # Segments tiling [offset, offset + length), in genome coordinates
+    words, weights = vocabulary
+    lengths = rng.geometric(1.0 / mean_length, size=int(length / mean_length * 1.2) + 16)
+    while lengths.sum() < length:
+        lengths = np.append(lengths, rng.geometric(1.0 / mean_length, size=len(lengths) // 2 + 16))
+    ends = np.cumsum(lengths)
+    count = int(np.searchsorted(ends, length)) + 1
+    ends = np.minimum(ends[:count], length)
+    starts = np.append(0, ends[:-1])
+    return pd.DataFrame({
+        'Start': starts + offset,
+        'End': ends + offset,
+        'Length': ends - starts,
+        'Cost': np.round(rng.gamma(2.0, 0.6, count), 4),
+        'Best Word': words[rng.choice(len(words), size=count, p=weights)],
+    })
+
+
+def merge_segments(segments, rng):
+    # Runs of 1-4 neighbouring segments merged into one, keeping the first word and summing the costs
+    run_lengths = rng.integers(1, 5, size=len(segments))
+    firsts = np.cumsum(np.append(0, run_lengths))
+    firsts = firsts[firsts < len(segments)]
+    lasts = np.append(firsts[1:], len(segments)) - 1
+    return pd.DataFrame({
+        'Start': segments['Start'].to_numpy()[firsts],
+        'End': segments['End'].to_numpy()[lasts],
+        'Length': segments['End'].to_numpy()[lasts] - segments['Start'].to_numpy()[firsts],
+        'Cost': np.round(np.add.reduceat(segments['Cost'].to_numpy(), firsts), 4),
+        'Best Word': segments['Best Word'].to_numpy()[firsts],
+    })
+
+
+def write_segment_fasta(f, bases, segments, offset):
+    # One record per segment named by its Start, as GCSkewPlotter matches them
+    starts = segments['Start'].to_numpy()
+    ends = segments['End'].to_numpy()
+    for first in range(0, len(starts), 100_000):
+        f.write(b''.join(b'>%d\n%s\n' % (start, bases[start - offset:end - offset])
+                         for start, end in zip(starts[first:first + 100_000], ends[first:first + 100_000])))
+
+
+def read_record(genome_file, name):
+    with FastaIndex(genome_file) as index:
+        return index.fetch(name)
+
+
+def compress_genome(genome_file, compress):
+    # Replace genome.fna by genome.fna.gz; returns the new path
+    target = genome_file + '.gz'
+    if compress == 'bgzf':
+        write_bgzf(genome_file, target)
+    else:
+        with open(genome_file, 'rb') as f, gzip.open(target, 'wb') as out:
+            shutil.copyfileobj(f, out, 1 << 24)
+    for path in (genome_file, genome_file + '.fai', target + '.fai', target + '.gzi'):
+        if os.path.exists(path):
+            os.remove(path)
+    return target
+
+
+def generate_dataset(directory, genome_bases, records=4, window_size=DEFAULT_WINDOW_SIZE,
+                     segment_length=DEFAULT_SEGMENT_LENGTH, vocabulary_size=DEFAULT_VOCABULARY,
+                     segment_fasta=True, compress='none', seed=0):
+    """Write a dataset into ``directory`` and return its metadata (see the module docstring)."""
+    params = {'genome_bases': genome_bases, 'records': records, 'window_size': window_size,
+              'segment_length': segment_length, 'vocabulary_size': vocabulary_size,
+              'segment_fasta': segment_fasta, 'compress': compress, 'seed': seed}
+    segments_dir = os.path.join(directory, 'segments')
+    isochores_dir = os.path.join(directory, 'isochores')
+    os.makedirs(segments_dir, exist_ok=True)
+    os.makedirs(isochores_dir, exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    vocabulary = make_vocabulary(vocabulary_size, rng)
+    genome_file = os.path.join(directory, 'genome.fna')
+    segment_fasta_file = os.path.join(directory, 'segments.fna')
+    counts = {'genome_bases': 0, 'segment_rows': 0, 'merged_rows': 0, 'isochore_rows': 0}
+
+    print(f"🧬 Generating {genome_bases:,} bases in {records} records into {directory}...")
+    names = [f"chr{i + 1}" for i in range(records)]
+    lengths = record_lengths(genome_bases, records)
+    with open(genome_file, 'wb') as f:
+        for name, length in zip(names, lengths):
+            gc = write_fasta_record(f, name, length, window_size, rng)
+            pd.DataFrame({'Start': np.arange(len(gc), dtype=np.int64) * window_size, 'GC_Content': np.round(gc, 4)}) \
+                .to_csv(os.path.join(isochores_dir, f"isochores_output_{name}_{window_size}.csv"), index=False)
+            counts['genome_bases'] += length
+            counts['isochore_rows'] += len(gc)
+
+    offset = 0
+    segment_fasta_handle = open(segment_fasta_file, 'wb') if segment_fasta else None
+    try:
+        for name, length in zip(names, lengths):
+            segments = make_segments(length, offset, segment_length, vocabulary, rng)
+            merged = merge_segments(segments, rng)
+            segments.to_csv(os.path.join(segments_dir, f"segments_output_{name}.csv"), index=False)
+            merged.to_csv(os.path.join(segments_dir, f"merged_segments_output_{name}.csv"), index=False)
+            counts['segment_rows'] += len(segments)
+            counts['merged_rows'] += len(merged)
+            if segment_fasta_handle is not None:
+                write_segment_fasta(segment_fasta_handle, read_record(genome_file, name), segments, offset)
+            offset += length
+    finally:
+        if segment_fasta_handle is not None:
+            segment_fasta_handle.close()
+
+    if compress != 'none':
+        print(f"🗜️ Compressing the genome ({compress})...")
+        genome_file = compress_genome(genome_file, compress)
+
+    meta = {'params': params, 'counts': counts, 'genome_file': genome_file,
+            'segment_fasta_file': segment_fasta_file if segment_fasta else None,
+            'segments_dir': segments_dir, 'isochores_dir': isochores_dir}
+    with open(os.path.join(directory, DATASET_META), 'w') as f:
+        json.dump(meta, f, indent=2)
+    print(f"✅ Dataset ready: {counts['segment_rows']:,} segments, {counts['merged_rows']:,} merged, "
+          f"{counts['isochore_rows']:,} isochore windows")
+    return meta
+
+
+def ensure_dataset(directory, genome_bases, **options):
+    """Reuse the dataset in ``directory`` when it was generated with the same parameters."""
+    try:
+        with open(os.path.join(directory, DATASET_META), 'r') as f:
+            meta = json.load(f)
+        wanted = dict(meta['params'], genome_bases=genome_bases, **options)
+        # A dataset with segments.fna also serves runs that do not need it
+        wanted['segment_fasta'] = meta['params']['segment_fasta'] or wanted['segment_fasta']
+        if meta['params'] == wanted:
+            return meta
+    except (OSError, ValueError, KeyError):
+        pass
+    return generate_dataset(directory, genome_bases, **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output_dir')
+    parser.add_argument('--scale', default='10mb', help=f"{', '.join(SCALES)} or any '<number>kb/mb/gb'")
+    parser.add_argument('--records', type=int, default=4)
+    parser.add_argument('--window-size', type=int, default=DEFAULT_WINDOW_SIZE)
+    parser.add_argument('--segment-length', type=int, default=DEFAULT_SEGMENT_LENGTH, help='mean segment length')
+    parser.add_argument('--no-segment-fasta', dest='segment_fasta', action='store_false',
+                        help='skip segments.fna (only the GC skew benchmark needs it)')
+    parser.add_argument('--compress', choices=COMPRESSIONS, default='none', help='how genome.fna is compressed')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generate_dataset(args.output_dir, parse_scale(args.scale), records=args.records, window_size=args.window_size,
+                     segment_length=args.segment_length, segment_fasta=args.segment_fasta, compress=args.compress,
+                     seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+import os
+import copy
+import shutil
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import matplotlib
+
+import instrumentation
+import image_writer
+from image_writer import OutputSettings
+from input_scanner import scan_inputs
+from figure_template import clear_templates
+
+# Outcome of one file in a batch: the task's return value, or the error that stopped it,
+# plus the file's stage timings when instrumentation is on
+BatchResult = namedtuple('BatchResult', ['file', 'result', 'error', 'stages'], defaults=(None,))
+
+
+def default_jobs():
+    return os.cpu_count() or 1
+
+
+class BatchPlotter:
+    """Options every batch mode shares; the plotters subclass it and add their own.
+
+    ``jobs``: number of worker processes, 0 or None uses every CPU (see
+    ``run_batch``); with a process pool each worker keeps its own caches.
+    ``force``: rebuild every output instead of only those whose inputs or
+    parameters changed (see ``build_manifest``).
+    ``use_segment_cache``: keep a columnar copy of each parsed segments CSV
+    next to it for faster re-runs (see ``segment_loader``).
+    ``rasterized``: rasterize the data series in vector outputs; decorations
+    stay vector.
+    ``inventory``: the files found by ``input_scanner.scan_inputs``, shared
+    between modes; the input directory is scanned on first use when not given.
+    ``output``: chart format, dpi and compression (``image_writer.OutputSettings``);
+    PNG by default, at the mode's ``DEFAULT_DPI`` unless a dpi is given.
+
+    A mode ignores the options that do not apply to it (scatter plots are
+    HTML, so they are never rasterized or compressed).
+    """
+
+    # dpi when the output settings leave it unset; None keeps the figure's own
+    DEFAULT_DPI = None
+
+    def __init__(self, input_dir, output_dir, jobs=1, force=False, use_segment_cache=True, rasterized=False,
+                 inventory=None, output=None):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.jobs = jobs
+        self.force = force
+        self.use_segment_cache = use_segment_cache
+        self.rasterized = rasterized
+        self.inventory = inventory
+        self.output = (output or OutputSettings()).with_default_dpi(self.DEFAULT_DPI)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def inputs(self):
+        return self.inventory or scan_inputs(self.input_dir)
+
+    def batch_options(self):
+        # The shared options, to build another mode over the same inputs (see SegmentPipeline)
+        return {'jobs': self.jobs, 'force': self.force, 'use_segment_cache': self.use_segment_cache,
+                'rasterized': self.rasterized, 'inventory': self.inventory, 'output': self.output}
+
+
+def _init_worker(writers):
+    # Workers only ever save figures, never show them. Under spawn they start from a fresh import,
+    # so the parent's encoder thread count is passed in rather than inherited.
+    matplotlib.use('Agg', force=True)
+    image_writer.set_writers(writers)
+
+
+def _call(task, file, wait_images, instrument=False):
+    try:
+        result = BatchResult(file, task(file), None)
+    except Exception as e:
+        result = BatchResult(file, None, f"{type(e).__name__}: {e}")
+    if wait_images:
+        result = _settle_images(result, image_writer.take_pending(), instrument)
+    return result
+
+
+def _settle_images(result, pending, instrument=False):
+    # A file whose charts could not be written failed, even if its task returned
+    errors = image_writer.wait_pending(pending)
+    if errors and result.error is None:
+        result = result._replace(result=None, error=f"OSError: {'; '.join(errors)}")
+    if instrument:
+        # The compression done on the writer threads, which the file's 'save' stages no longer include
+        encodes = [instrumentation.stage_record('encode', result.file, wall, cpu)
+                   for _, wall, cpu in image_writer.encode_times(pending)]
+        result = result._replace(stages=(result.stages or []) + encodes)
+    return result
+
+
+def _run_task(task, file, instrument=False, wait_images=True):
+    if not instrument:
+        return _call(task, file, wait_images)
+
+    # Stages are collected here (in the worker, with a pool) and travel back in the result
+    with instrumentation.recording(file) as stages:
+        with instrumentation.stage('total'):
+            result = _call(task, file, wait_images, instrument)
+    return result._replace(stages=stages + (result.stages or []))
+
+
+def run_batch(task, files, jobs=1, progress=None, cancel_event=None):
+    """Run ``task(file)`` for every file and return a BatchResult per file, in input order.
+
+    With ``jobs`` > 1 the files are fanned out to a process pool with the Agg
+    backend forced in every worker; ``task`` and its instance must be
+    picklable. A file that raises, or whose charts could not be written (see
+    ``image_writer``), is recorded as a failure without stopping the rest of
+    the batch.
+
+    ``progress(done, total, current_file)`` is called as files start and
+    finish (``current_file`` is None once the batch is over). Setting
+    ``cancel_event`` stops the batch between files; only files that were
+    processed appear in the results.
+
+    When instrumentation is enabled every file's stages are recorded (see
+    ``instrumentation``), and with a profile directory the slowest file is
+    run once more under cProfile, writing its charts into a scratch directory.
+    """
+    files = list(files)
+    jobs = default_jobs() if jobs is None or jobs <= 0 else jobs
+    report = progress or (lambda done, total, current_file: None)
+    instrument = instrumentation.is_enabled()
+
+    if jobs == 1 or len(files) <= 1:
+        results = []
+        pending = []
+        for file in files:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            report(len(results), len(files), file)
+            # ✅ Charts keep encoding on the writer threads while the next file is processed
+            results.append(_run_task(task, file, instrument, wait_images=False))
+            pending.append(image_writer.take_pending())
+        results = [_settle_images(result, images, instrument) for result, images in zip(results, pending)]
+    else:
+        results = _run_pool(task, files, jobs, report, cancel_event, instrument)
+
+    report(len(results), len(files), None)
+    if len(results) < len(files):
+        print(f"⏹️ Cancelled after {len(results)} of {len(files)} files.")
+
+    failures = [result for result in results if result.error is not None]
+    for result in failures:
+        print(f"❌ Error processing {result.file}: {result.error}")
+    if failures:
+        print(f"⚠️ {len(failures)} of {len(results)} files failed.")
+
+    if instrument:
+        stages = [record for result in results for record in result.stages or []]
+        instrumentation.add_records(stages)
+        slowest = instrumentation.slowest_file(stages)
+        if instrumentation.profile_dir() and slowest is not None:
+            _profile_slowest(task, slowest)
+
+    # The templates' figures and render buffers are only reused within a batch
+    clear_templates()
+    return results
+
+
+def _redirected(plotter, output_dir):
+    clone = copy.copy(plotter)
+    clone.output_dir = output_dir
+    # A pipeline's plotters write the charts themselves
+    if isinstance(getattr(clone, 'plotters', None), dict):
+        clone.plotters = {mode: _redirected(each, output_dir) for mode, each in clone.plotters.items()}
+    return clone
+
+
+def _profile_slowest(task, file):
+    # The re-run goes to a copy of the plotter writing into a scratch directory, so the batch's
+    # outputs (and what the manifest recorded for them) stay as they are
+    plotter = getattr(task, '__self__', None)
+    if plotter is None or not hasattr(plotter, 'output_dir'):
+        print(f"⚠️ Not profiling {file}: its task has no output directory to redirect.")
+        return None
+
+    print(f"🔬 Profiling the slowest file again: {file}")
+    scratch = tempfile.mkdtemp(prefix='dna_chart_profile_')
+    try:
+        scratch_task = getattr(_redirected(plotter, scratch), task.__name__)
+        return instrumentation.profile_call(scratch_task, file, instrumentation.profile_dir())
+    finally:
+        image_writer.wait_pending(image_writer.take_pending())
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def _run_pool(task, files, jobs, report, cancel_event, instrument=False):
+    workers = min(jobs, len(files))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(image_writer.writer_count(),)) as pool:
+        queued = iter(files)
+        running = {}
+        finished = {}
+
+        # Keep only one file per worker in flight, so cancelling stops new work right away
+        def submit_next():
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            file = next(queued, None)
+            if file is not None:
+                running[pool.submit(_run_task, task, file, instrument)] = file
+
+        for _ in range(workers):
+            submit_next()
+        report(0, len(files), files[0])
+
+        while running:
+            done, _ = wait(running, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in done:
+                file = running.pop(future)
+                try:
+                    finished[file] = future.result()
+                except Exception as e:
+                    # The worker itself died (e.g. out of memory)
+                    finished[file] = BatchResult(file, None, f"{type(e).__name__}: {e}")
+                submit_next()
+                report(len(finished), len(files), min(running.values(), key=files.index, default=None))
+
+    return [finished[file] for file in files if file in finished]
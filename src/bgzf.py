@@ -0,0 +1,172 @@
+import os
+import gzip
+import zlib
+import struct
+import numpy as np
+
+GZIP_MAGIC = b'\x1f\x8b'
+# Bytes of the fixed part of a gzip member header, up to and including XLEN
+HEADER_SIZE = 12
+# Uncompressed bytes per read when streaming a (plain or compressed) file
+READ_BLOCK_SIZE = 1 << 24
+# Uncompressed bytes per written block, as bgzip uses (a block must stay under 64 KiB compressed)
+BLOCK_DATA_SIZE = 0xff00
+# Decompressed BGZF blocks kept per reader; neighbouring slices usually share their edge blocks
+CACHED_BLOCKS = 8
+
+
+def is_gzip(path):
+    with open(path, 'rb') as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def block_size(extra):
+    # BSIZE from the 'BC' extra subfield: the whole block's size minus one; None when missing
+    position = 0
+    while position + 4 <= len(extra):
+        length = struct.unpack_from('<H', extra, position + 2)[0]
+        if extra[position:position + 2] == b'BC' and length == 2:
+            return struct.unpack_from('<H', extra, position + 4)[0] + 1
+        position += 4 + length
+    return None
+
+
+def read_block_header(f):
+    """Read one BGZF block header at the current position; returns the block size, or None at the end or if not BGZF."""
+    header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE or header[:2] != GZIP_MAGIC or not header[3] & 4:
+        return None
+    extra = f.read(struct.unpack_from('<H', header, 10)[0])
+    return block_size(extra)
+
+
+def is_bgzf(path):
+    """True for BGZF (bgzip) files: gzip members that carry their own size, so blocks can be found without inflating."""
+    with open(path, 'rb') as f:
+        return read_block_header(f) is not None
+
+
+def open_stream(path):
+    """Open a plain, gzip or BGZF file for sequential binary reads of its uncompressed bytes."""
+    return gzip.open(path, 'rb') if is_gzip(path) else open(path, 'rb')
+
+
+def build_block_index(path):
+    """Compressed and uncompressed start offset of every block, read from the block headers and trailers only."""
+    compressed, uncompressed = [], []
+    position = total = 0
+    with open(path, 'rb') as f:
+        while True:
+            f.seek(position)
+            size = read_block_header(f)
+            if size is None:
+                break
+            # ISIZE, the block's uncompressed size, is its last 4 bytes
+            f.seek(position + size - 4)
+            compressed.append(position)
+            uncompressed.append(total)
+            total += struct.unpack('<I', f.read(4))[0]
+            position += size
+    return np.array(compressed, dtype=np.uint64), np.array(uncompressed, dtype=np.uint64)
+
+
+def write_gzi(compressed, uncompressed, index_file):
+    # samtools' .gzi layout: entry count, then (compressed, uncompressed) pairs for every block but the first
+    pairs = np.column_stack([compressed[1:], uncompressed[1:]]).astype('<u8')
+    with open(index_file + '.tmp', 'wb') as f:
+        f.write(struct.pack('<Q', len(pairs)))
+        f.write(pairs.tobytes())
+    os.replace(index_file + '.tmp', index_file)
+
+
+def read_gzi(index_file):
+    with open(index_file, 'rb') as f:
+        count = struct.unpack('<Q', f.read(8))[0]
+        pairs = np.frombuffer(f.read(16 * count), dtype='<u8').reshape(count, 2)
+    return (np.concatenate([[0], pairs[:, 0]]).astype(np.uint64),
+            np.concatenate([[0], pairs[:, 1]]).astype(np.uint64))
+
+
+class BgzfReader:
+    """Random access to the uncompressed bytes of a BGZF file: ``reader[start:stop]``.
+
+    A .gzi block index (samtools' format) is built next to the file on
+    first use and reused while it is newer than the file. A slice inflates
+    only the blocks it overlaps; the last few blocks are kept decompressed.
+    """
+
+    def __init__(self, path, index_file=None):
+        self.path = path
+        self.index_file = index_file or path + '.gzi'
+        self.compressed, self.uncompressed = self._load_index()
+        self._file = open(path, 'rb')
+        self._blocks = {}
+
+    def _load_index(self):
+        if os.path.exists(self.index_file) and os.path.getmtime(self.index_file) >= os.path.getmtime(self.path):
+            return read_gzi(self.index_file)
+
+        print(f"🔎 Building BGZF block index for {self.path}...")
+        compressed, uncompressed = build_block_index(self.path)
+        try:
+            write_gzi(compressed, uncompressed, self.index_file)
+            print(f"✅ Block index saved to {self.index_file}")
+        except OSError as e:
+            print(f"⚠️ Could not save block index {self.index_file}: {e}")
+        return compressed, uncompressed
+
+    def block(self, number):
+        if number not in self._blocks:
+            self._file.seek(int(self.compressed[number]))
+            size = read_block_header(self._file)
+            header_size = self._file.tell() - int(self.compressed[number])
+            data = self._file.read(size - header_size)
+            # Raw deflate data between the header and the CRC32/ISIZE trailer
+            if len(self._blocks) >= CACHED_BLOCKS:
+                self._blocks.pop(next(iter(self._blocks)))
+            self._blocks[number] = zlib.decompress(data[:-8], -zlib.MAX_WBITS)
+        return self._blocks[number]
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1) or key.start is None or key.stop is None:
+            raise TypeError("BgzfReader only supports [start:stop] slices")
+        start, stop = key.start, key.stop
+        if stop <= start or not len(self.compressed):
+            return b''
+
+        number = int(np.searchsorted(self.uncompressed, np.uint64(start), side='right')) - 1
+        pieces = []
+        position = start
+        while position < stop and number < len(self.compressed):
+            data = self.block(number)
+            offset = position - int(self.uncompressed[number])
+            piece = data[offset:stop - int(self.uncompressed[number])]
+            pieces.append(piece)
+            position += len(piece)
+            number += 1
+        return b''.join(pieces)
+
+    def close(self):
+        self._file.close()
+        self._blocks = {}
+
+
+def compress_block(data):
+    # One BGZF block: gzip header with the BC subfield, raw deflate data, CRC32 and ISIZE
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    header = GZIP_MAGIC + b'\x08\x04' + b'\x00' * 4 + b'\x00\xff' + struct.pack('<H', 6) + b'BC' + \
+        struct.pack('<HH', 2, HEADER_SIZE + 6 + len(deflated) + 8 - 1)
+    return header + deflated + struct.pack('<II', zlib.crc32(data), len(data))
+
+
+def write_bgzf(source, target):
+    """Compress ``source`` into a BGZF file, as ``bgzip`` does, ending with the empty EOF block."""
+    with open(source, 'rb') as f, open(target + '.tmp', 'wb') as out:
+        while True:
+            data = f.read(BLOCK_DATA_SIZE)
+            if not data:
+                break
+            out.write(compress_block(data))
+        out.write(compress_block(b''))
+    os.replace(target + '.tmp', target)
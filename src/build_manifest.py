@@ -0,0 +1,102 @@
+import os
+import json
+import hashlib
+
+MANIFEST_NAME = '.dna_chart_manifest.json'
+
+
+def file_signature(path, use_hash=False):
+    stat = os.stat(path)
+    signature = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if use_hash:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        signature['sha1'] = digest.hexdigest()
+    return signature
+
+
+class BuildManifest:
+    """Records what each input produced so re-runs only rebuild stale charts.
+
+    The manifest lives in the output directory. For every (mode, input) it
+    stores the input's size and mtime (plus a SHA-1 when ``use_hash`` is on,
+    so a touched but unchanged file is still considered current), the
+    parameters used and the outputs written.
+    """
+
+    def __init__(self, output_dir, use_hash=False):
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.use_hash = use_hash
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable manifest {self.path}: {e}")
+
+    @staticmethod
+    def entry_key(mode, file):
+        return f"{mode}:{os.path.abspath(file)}"
+
+    @staticmethod
+    def normalize(params):
+        # Compare parameters the way they are stored (tuples become lists, etc.)
+        return json.loads(json.dumps(params, sort_keys=True, default=str))
+
+    def is_current(self, mode, file, params):
+        entry = self.entries.get(self.entry_key(mode, file))
+        if entry is None or not os.path.exists(file):
+            return False
+        if entry['params'] != self.normalize(params):
+            return False
+        if not all(os.path.exists(output) for output in entry['outputs']):
+            return False
+
+        recorded = entry['input']
+        signature = file_signature(file)
+        if recorded['size'] != signature['size']:
+            return False
+        if recorded['mtime_ns'] == signature['mtime_ns']:
+            return True
+        return self.use_hash and 'sha1' in recorded and recorded['sha1'] == file_signature(file, True)['sha1']
+
+    def outputs(self, mode, file):
+        return self.entries[self.entry_key(mode, file)]['outputs']
+
+    def stale_files(self, mode, files, params, force=False):
+        """Return the files that need rebuilding, reporting how many are skipped."""
+        if force:
+            return list(files)
+        stale = [file for file in files if not self.is_current(mode, file, params)]
+        skipped = len(files) - len(stale)
+        if skipped:
+            print(f"♻️ Skipping {skipped} up-to-date file(s); use force to rebuild them.")
+        return stale
+
+    def record(self, mode, file, params, outputs):
+        if isinstance(outputs, str):
+            outputs = [outputs]
+        self.entries[self.entry_key(mode, file)] = {
+            'input': file_signature(file, self.use_hash),
+            'params': self.normalize(params),
+            'outputs': [output for output in outputs if output],
+        }
+
+    def record_results(self, mode, results, params):
+        # Failed files, and files skipped with None, rebuild next time. An empty list means the file
+        # was processed and had nothing to draw, so it is recorded and skipped while unchanged.
+        for result in results:
+            if result.error is None and result.result is not None:
+                self.record(mode, result.file, params, result.result)
+        self.save()
+
+    def save(self):
+        try:
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(self.path + '.tmp', self.path)
+        except OSError as e:
+            print(f"⚠️ Could not save manifest {self.path}: {e}")
@@ -1,70 +1,224 @@
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.collections import PolyCollection
 import os
-import glob
-
-
-class ChartGenerator:
-    def __init__(self, input_dir, output_dir, threshold):
-        self.input_dir = input_dir
-        self.output_dir = output_dir
+import heapq
+import numpy as np
+from collections import Counter
+from batch_runner import run_batch, BatchPlotter
+from build_manifest import BuildManifest
+from segment_loader import load_segments
+from figure_template import FigureTemplate, bar_vertices
+import image_writer
+import instrumentation
+
+# Files at least this large are counted in chunks instead of being loaded whole
+STREAMING_MIN_BYTES = 256 * 1024 * 1024
+DEFAULT_CHUNK_ROWS = 1_000_000
+OTHER_LABEL = 'other'
+
+
+def stream_word_counts(file_path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # Reads only the 'Best Word' column, chunk by chunk; memory grows with the vocabulary, not the file
+    counts = Counter()
+    chunks = pd.read_csv(file_path, usecols=['Best Word'], dtype={'Best Word': 'category'}, chunksize=chunk_rows)
+    for chunk in chunks:
+        chunk_counts = chunk['Best Word'].value_counts()
+        counts.update(dict(zip(chunk_counts.index.astype(str), chunk_counts.to_numpy())))
+    return counts
+
+
+def counts_to_series(counts):
+    # Word -> Count, most frequent first (ties in word order, so output is deterministic)
+    series = pd.Series(counts, dtype='int64').rename_axis('Word').rename('Count')
+    return series.sort_index().sort_values(ascending=False, kind='stable')
+
+
+def other_label(words):
+    # 'other', or '(other)', '((other))'...: never the name of a real word, so the aggregate can't overwrite one
+    label = OTHER_LABEL
+    while label in words:
+        label = f"({label})"
+    return label
+
+
+def top_words(counts, k):
+    # K most frequent words plus one 'other' entry for the rest; works on a Counter or a Series.
+    # ✅ A bounded heap: O(V log K) instead of sorting the whole vocabulary
+    if k < 1:
+        raise ValueError(f"top_k must be at least 1, not {k}")
+    counts = dict(counts.items())
+    top = heapq.nlargest(k, counts.items(), key=lambda item: item[1])
+    top_counts = pd.Series(dict(top), dtype='int64').rename_axis('Word').rename('Count')
+    other = int(sum(counts.values())) - int(top_counts.sum())
+    if other > 0:
+        top_counts[other_label(counts)] = other
+    return top_counts
+
+
+class WordChartTemplate(FigureTemplate):
+    # Word frequency bars; the words become the x tick labels
+    figsize = (12, 6)
+
+    def decorate(self, ax):
+        bars = PolyCollection([], edgecolors='none')
+        bars.sticky_edges.y.append(0)
+        ax.add_collection(bars)
+        ax.set_xlabel('Word')
+        ax.set_ylabel('Count')
+        return {'bars': bars}
+
+    def update(self, ax, artists, words, counts, colors):
+        positions = np.arange(len(words))
+        artists['bars'].set_verts(bar_vertices(positions, counts, 0.8))
+        artists['bars'].set_facecolors(colors)
+        ax.set_xticks(positions, labels=words, rotation=45)
+
+
+class ChartGenerator(BatchPlotter):
+    # Columns read from each segments file
+    SEGMENT_COLUMNS = ['Best Word']
+
+    def __init__(self, input_dir, output_dir, threshold, streaming=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                 combined=False, top_k=None, **options):
+        # jobs, force, output and the other shared options: see BatchPlotter
+        super().__init__(input_dir, output_dir, **options)
         self.threshold = threshold
-        os.makedirs(self.output_dir, exist_ok=True)
+        # Count words in chunks: True/False to force it, None to decide by file size
+        self.streaming = streaming
+        self.chunk_rows = chunk_rows
+        # Chart the counts of all files together instead of one chart per file
+        self.combined = combined
+        # Chart only the K most frequent words (plus an 'other' bar) instead of filtering by threshold
+        if top_k is not None and top_k < 1:
+            raise ValueError(f"top_k must be at least 1, not {top_k}")
+        self.top_k = top_k
 
     def get_files(self):
-        all_files = glob.glob(os.path.join(self.input_dir, '*.csv'))
-        segment_files = [f for f in all_files if 'segments_output_' in f]
-        merged_files = [f for f in all_files if 'merged_segments_output_' in f]
-        return segment_files, merged_files
+        inventory = self.inputs()
+        return list(inventory.segments), list(inventory.merged_segments)
+
+    def manifest_params(self):
+        return {'threshold': self.threshold, 'top_k': self.top_k, 'output': self.output._asdict(),
+                'rasterized': self.rasterized}
 
-    def create_chart(self, file_path):
+    def use_streaming(self, file_path):
+        if self.streaming is not None:
+            return self.streaming
+        return os.path.getsize(file_path) >= STREAMING_MIN_BYTES
+
+    def count_words(self, file_path, df=None):
+        # df: the file's segments when already loaded (e.g. by SegmentPipeline)
         try:
-            df = pd.read_csv(file_path)
+            if df is None and self.use_streaming(file_path):
+                if 'Best Word' not in pd.read_csv(file_path, nrows=0).columns:
+                    print(f"Skipping {file_path} - 'Best Word' column not found.")
+                    return None
+                with instrumentation.stage('stream_count'):
+                    return stream_word_counts(file_path, self.chunk_rows)
+
+            if df is None:
+                with instrumentation.stage('load'):
+                    df = load_segments(file_path, self.SEGMENT_COLUMNS, use_cache=self.use_segment_cache)
         except Exception as e:
             print(f"Failed to load {file_path}: {e}")
-            return
+            return None
 
         if 'Best Word' not in df.columns:
             print(f"Skipping {file_path} - 'Best Word' column not found.")
-            return
+            return None
 
         # Count occurrences of each word
-        word_counts = df['Best Word'].value_counts().reset_index()
+        with instrumentation.stage('count'):
+            word_counts = df['Best Word'].value_counts()
+            word_counts = word_counts[word_counts > 0]
+            word_counts.index = word_counts.index.astype(str)
+        return word_counts
+
+    def create_chart(self, file_path, df=None):
+        word_counts = self.count_words(file_path, df)
+        if word_counts is None:
+            return
+
+        output_file = os.path.join(self.output_dir, os.path.basename(file_path).replace('.csv', self.output.extension))
+        chart = self.plot_word_counts(word_counts, os.path.basename(file_path), output_file)
+        if self.top_k is None:
+            # No word above the threshold: nothing to write, but the file is done until it changes
+            return chart if chart is not None else []
+
+        table_file = os.path.join(self.output_dir, os.path.basename(file_path).replace('.csv', '_word_counts.csv'))
+        return [chart, self.save_word_counts(word_counts, table_file)]
+
+    def save_word_counts(self, counts, table_file):
+        counts_to_series(counts).to_csv(table_file)
+        print(f"✅ Counts table saved to {table_file}")
+        return table_file
+
+    def plot_word_counts(self, counts, title, output_file):
+        if self.top_k is not None:
+            word_counts = top_words(counts, self.top_k).reset_index()
+        else:
+            word_counts = counts_to_series(counts).reset_index()
         word_counts.columns = ['Word', 'Count']
 
-        # Filter based on threshold
-        word_counts = word_counts[word_counts['Count'] >= self.threshold]
+        # Filter based on threshold (top-K mode keeps its K words whatever their count)
+        if self.top_k is None:
+            word_counts = word_counts[word_counts['Count'] >= self.threshold]
 
         if word_counts.empty:
-            print(f"No significant words to plot for {file_path}")
+            print(f"No significant words to plot for {title}")
             return
 
-        plt.figure(figsize=(12, 6))
-        plt.bar(word_counts['Word'], word_counts['Count'], color='green')
-        plt.xlabel('Word')
-        plt.ylabel('Count')
-        plt.title(f"Word Frequency - {os.path.basename(file_path)}")
-        plt.xticks(rotation=45)
-
-        output_file = os.path.join(self.output_dir, os.path.basename(file_path).replace('.csv', '.png'))
-        plt.savefig(output_file, format='png')
-        plt.close()
+        # The 'other' bar is the only label that is not one of the counted words
+        colors = ['gray' if word not in counts else 'green' for word in word_counts['Word']]
+        # ✅ Reuse the decorated figure; only the bars and tick labels change per file
+        WordChartTemplate.get(rasterized=self.rasterized, dpi=None).render(
+            output_file, f"Word Frequency - {title}", self.output,
+            words=word_counts['Word'].astype(str).tolist(), counts=word_counts['Count'].to_numpy(), colors=colors)
 
         print(f"✅ Chart saved to {output_file}")
+        return output_file
 
-    def process_files(self):
+    def process_files(self, progress=None, cancel_event=None):
         segment_files, merged_files = self.get_files()
 
         if not segment_files and not merged_files:
             print("⚠️ No matching files found.")
             return
 
-        print("\nProcessing segments_output_ files:")
-        for file_path in segment_files:
-            self.create_chart(file_path)
+        if self.combined:
+            return self.create_combined_charts(segment_files, merged_files, progress, cancel_event)
 
-        print("\nProcessing merged_segments_output_ files:")
-        for file_path in merged_files:
-            self.create_chart(file_path)
+        print(f"\nProcessing {len(segment_files)} segments_output_ and {len(merged_files)} merged_segments_output_ files:")
+        manifest = BuildManifest(self.output_dir)
+        params = self.manifest_params()
+        files = manifest.stale_files('words', sorted(segment_files) + sorted(merged_files), params, self.force)
+        results = run_batch(self.create_chart, files, self.jobs, progress, cancel_event)
+        manifest.record_results('words', results, params)
 
         print("\n✅ All charts created and saved!")
+        return results
+
+    def create_combined_charts(self, segment_files, merged_files, progress=None, cancel_event=None):
+        # Merged files are derived from the segment files, so each group gets its own combined chart
+        groups = [
+            ('segments_output', sorted(segment_files)),
+            ('merged_segments_output', sorted(merged_files)),
+        ]
+        results = run_batch(self.count_words, groups[0][1] + groups[1][1], self.jobs, progress, cancel_event)
+        counts_by_file = {result.file: result.result for result in results if result.result is not None}
+
+        for name, files in groups:
+            counts = Counter()
+            for file in files:
+                if file in counts_by_file:
+                    counts.update(dict(counts_by_file[file].items()))
+            if not counts:
+                continue
+
+            self.save_word_counts(counts, os.path.join(self.output_dir, f"combined_{name}_word_counts.csv"))
+            self.plot_word_counts(counts, f"all {name}_ files ({len(files)})",
+                                  os.path.join(self.output_dir, f"combined_{name}{self.output.extension}"))
+
+        image_writer.flush()
+        print("\n✅ Combined charts created and saved!")
+        return results
@@ -0,0 +1,354 @@
+import os
+import mmap
+from collections import namedtuple
+
+import numpy as np
+
+from bgzf import BgzfReader, is_gzip, is_bgzf, open_stream, READ_BLOCK_SIZE
+
+# Bases read per chunk when streaming a record
+DEFAULT_CHUNK_SIZE = 1 << 24
+
+# One line of a samtools-style .fai index
+FaiRecord = namedtuple('FaiRecord', ['name', 'length', 'offset', 'line_bases', 'line_width'])
+
+
+def build_fai(fasta_file):
+    """Scan a FASTA file (plain or BGZF) and return its .fai records in file order.
+
+    For a BGZF file the offsets are positions in the uncompressed bytes, as in
+    samtools' index of a bgzip-compressed FASTA.
+    """
+    records = []
+    name = None
+    length = offset = line_bases = line_width = 0
+    short_line_seen = False
+    position = 0
+
+    with open_stream(fasta_file) as f:
+        for line in f:
+            line_length = len(line)
+            if line.startswith(b'>'):
+                if name is not None:
+                    records.append(FaiRecord(name, length, offset, line_bases, line_width))
+                name = parse_header(line)
+                length = line_bases = line_width = 0
+                short_line_seen = False
+                offset = position + line_length
+            elif name is not None:
+                bases = len(line.rstrip(b'\r\n'))
+                if bases == 0:
+                    if line_bases == 0:
+                        # Skip blank lines between the header and the sequence
+                        offset = position + line_length
+                    else:
+                        # Blank lines are only allowed after the last sequence line
+                        short_line_seen = True
+                elif line_bases == 0:
+                    line_bases, line_width = bases, line_length
+                elif short_line_seen or bases > line_bases:
+                    raise ValueError(f"Different line length in record '{name}' of {fasta_file}")
+                elif bases < line_bases or line_length != line_width:
+                    short_line_seen = True
+                length += bases
+            position += line_length
+
+    if name is not None:
+        records.append(FaiRecord(name, length, offset, line_bases, line_width))
+    return records
+
+
+def write_fai(records, index_file):
+    with open(index_file + '.tmp', 'w') as f:
+        for record in records:
+            f.write('\t'.join(str(value) for value in record) + '\n')
+    os.replace(index_file + '.tmp', index_file)
+
+
+def read_fai(index_file):
+    records = []
+    with open(index_file, 'r') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 5:
+                continue
+            records.append(FaiRecord(fields[0], *(int(value) for value in fields[1:5])))
+    return records
+
+
+class FastaIndex:
+    """Random access to a FASTA file through a .fai index and an mmap of the file.
+
+    The index is built next to the FASTA on first use (or in ``index_file``)
+    and reused while it is newer than the FASTA. Slices are returned as raw
+    bytes with line breaks removed, so only the requested bases are copied.
+    BGZF-compressed (bgzip) files are read through their block index instead
+    of an mmap; plain gzip has no random access (see ``open_fasta``).
+    """
+
+    def __init__(self, fasta_file, index_file=None):
+        self.fasta_file = fasta_file
+        self.index_file = index_file or fasta_file + '.fai'
+        self.bgzf = is_bgzf(fasta_file)
+        if not self.bgzf and is_gzip(fasta_file):
+            raise ValueError(f"{fasta_file} is gzip- but not BGZF-compressed; recompress it with bgzip "
+                             f"for random access")
+        self.records = {record.name: record for record in self._load_index()}
+        self.names = list(self.records)
+        self._file = None
+        self._mmap = None
+
+    def _load_index(self):
+        if os.path.exists(self.index_file) and \
+                os.path.getmtime(self.index_file) >= os.path.getmtime(self.fasta_file):
+            return read_fai(self.index_file)
+
+        print(f"🔎 Building FASTA index for {self.fasta_file}...")
+        records = build_fai(self.fasta_file)
+        try:
+            write_fai(records, self.index_file)
+            print(f"✅ Index saved to {self.index_file}")
+        except OSError as e:
+            print(f"⚠️ Could not save index {self.index_file}: {e}")
+        return records
+
+    def _open(self):
+        if self._mmap is None and self.bgzf:
+            # Sliced like the mmap, in uncompressed positions
+            self._mmap = BgzfReader(self.fasta_file)
+        elif self._mmap is None:
+            self._file = open(self.fasta_file, 'rb')
+            if os.fstat(self._file.fileno()).st_size == 0:
+                self._mmap = b''
+            else:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def _byte_offset(self, record, position):
+        return record.offset + (position // record.line_bases) * record.line_width + position % record.line_bases
+
+    def __contains__(self, name):
+        return name in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def length(self, name):
+        return self.records[name].length
+
+    def fetch(self, name, start=0, end=None):
+        """Return bases ``[start, end)`` of record ``name`` as bytes (0-based, half-open)."""
+        record = self.records[name]
+        end = record.length if end is None else min(end, record.length)
+        start = max(start, 0)
+        if start >= end:
+            return b''
+
+        data = self._open()
+        first = self._byte_offset(record, start)
+        last = self._byte_offset(record, end - 1) + 1
+        return data[first:last].translate(None, b'\r\n')
+
+    def iter_chunks(self, name, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yield ``(start, bases)`` chunks covering record ``name`` in order."""
+        length = self.records[name].length
+        for start in range(0, length, chunk_size):
+            yield start, self.fetch(name, start, start + chunk_size)
+
+    def close(self):
+        if self._mmap is not None and not isinstance(self._mmap, bytes):
+            self._mmap.close()
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getstate__(self):
+        # Open file handles and maps are not picklable; reopen lazily instead
+        state = self.__dict__.copy()
+        state['_file'] = None
+        state['_mmap'] = None
+        return state
+
+
+def parse_header(line):
+    # Record name: the first word after '>'
+    return line[1:].split(maxsplit=1)[0].decode('ascii') if line[1:].strip() else ''
+
+
+def sequence_file_found(fasta_file):
+    # The plotters' shared check before reading the selected sequence file
+    if not fasta_file or not os.path.exists(fasta_file):
+        print("⚠️ No sequence file selected or file not found.")
+        return False
+    return True
+
+
+def sequence_base_name(fasta_file):
+    # Output name prefix for a sequence file: its name up to the first dot (genome.fna.gz -> genome)
+    return os.path.basename(fasta_file).split('.')[0]
+
+
+def safe_record_name(name):
+    # A record name usable in output file names
+    return ''.join(ch if ch.isalnum() or ch in '-_.' else '_' for ch in name)
+
+
+def iter_fasta(fasta_file, block_size=READ_BLOCK_SIZE):
+    """Yield ``(name, bases)`` for every record, reading a plain, gzip or BGZF file in large binary blocks."""
+    name, parts = None, []
+    carry = b''
+    with open_stream(fasta_file) as f:
+        while True:
+            block = f.read(block_size)
+            data = carry + block
+            if block:
+                # Only whole lines are parsed; the last partial line waits for the next block
+                cut = data.rfind(b'\n') + 1
+                data, carry = data[:cut], data[cut:]
+
+            position = 0
+            while position < len(data):
+                if data.startswith(b'>', position):
+                    end = data.find(b'\n', position)
+                    end = len(data) if end < 0 else end
+                    if name is not None:
+                        yield name, b''.join(parts)
+                    name, parts = parse_header(data[position:end]), []
+                    position = end + 1
+                else:
+                    # Every sequence line up to the next header at once, without line breaks
+                    header = data.find(b'\n>', position)
+                    end = len(data) if header < 0 else header + 1
+                    if name is not None:
+                        parts.append(data[position:end].translate(None, b'\r\n'))
+                    position = end
+            if not block:
+                break
+
+    if name is not None:
+        yield name, b''.join(parts)
+
+
+def read_fasta(fasta_file):
+    """Read every record of a (plain, gzip or BGZF) FASTA file into memory as bytes."""
+    return FastaRecords(dict(iter_fasta(fasta_file)))
+
+
+def open_fasta(fasta_file):
+    """FastaIndex for plain and BGZF files; a plain gzip file can only be streamed, so it is read into memory."""
+    if is_gzip(fasta_file) and not is_bgzf(fasta_file):
+        print(f"⚠️ {fasta_file} is not BGZF-compressed, so it is read into memory (bgzip it for random access).")
+        return read_fasta(fasta_file)
+    return FastaIndex(fasta_file)
+
+
+class FastaRecords:
+    """FASTA records held in memory, read through the same methods as FastaIndex."""
+
+    def __init__(self, sequences):
+        self.sequences = sequences
+        self.names = list(sequences)
+
+    def __contains__(self, name):
+        return name in self.sequences
+
+    def __len__(self):
+        return len(self.sequences)
+
+    def length(self, name):
+        return len(self.sequences[name])
+
+    def fetch(self, name, start=0, end=None):
+        return self.sequences[name][max(start, 0):end]
+
+    def iter_chunks(self, name, chunk_size=DEFAULT_CHUNK_SIZE):
+        sequence = self.sequences[name]
+        for start in range(0, len(sequence), chunk_size):
+            yield start, sequence[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iter_concatenated(sequences, names, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield ``(offset, bases)`` chunks of the named records laid end to end, about ``chunk_size`` bases each.
+
+    Short records are joined into one chunk, so many small records cost one
+    chunk instead of one read each. ``sequences`` is a FastaIndex or FastaRecords.
+    """
+    buffered, size, offset = [], 0, 0
+    for name in names:
+        for _, bases in sequences.iter_chunks(name, chunk_size):
+            buffered.append(bases)
+            size += len(bases)
+            if size >= chunk_size:
+                yield offset, b''.join(buffered)
+                offset += size
+                buffered, size = [], 0
+    if buffered:
+        yield offset, b''.join(buffered)
+
+
+def numbered(names):
+    # Records named by a number (a FASTA of segments named by their Start) sit at that coordinate
+    return bool(names) and all(name.lstrip('-').isdigit() for name in names)
+
+
+class RecordIntervals:
+    """Where each record lies on one coordinate axis, sorted by start for binary search.
+
+    Records named by a number (a FASTA of segments named by their Start) sit
+    at that coordinate; otherwise the records are laid end to end in file
+    order, as the chromosomes of one genome.
+    """
+
+    def __init__(self, names, starts, lengths):
+        order = np.argsort(np.asarray(starts, dtype=np.int64), kind='stable')
+        self.names = [names[i] for i in order]
+        self.starts = np.asarray(starts, dtype=np.int64)[order]
+        self.lengths = np.asarray(lengths, dtype=np.int64)[order]
+        self.ends = self.starts + self.lengths
+
+    @classmethod
+    def of(cls, sequences, names=None):
+        names = list(sequences.names if names is None else names)
+        lengths = [sequences.length(name) for name in names]
+        if numbered(names):
+            starts = [int(name) for name in names]
+        else:
+            starts = np.cumsum([0] + lengths[:-1])
+        return cls(names, starts, lengths)
+
+    def locate(self, starts, ends=None):
+        """Find the record holding each ``[start, end)`` interval by binary search.
+
+        Returns the record's position in ``names`` (-1 when the interval is
+        not inside one record) and the interval in record coordinates.
+        Without ``ends`` every interval runs to the end of its record.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        if not self.names:
+            return np.full(len(starts), -1), starts, starts
+
+        records = np.searchsorted(self.starts, starts, side='right') - 1
+        found = records >= 0
+        records = np.where(found, records, 0)
+
+        record_ends = self.ends[records]
+        ends = record_ends if ends is None else np.asarray(ends, dtype=np.int64)
+        found &= (ends >= starts) & (ends <= record_ends)
+        local_starts = starts - self.starts[records]
+        return np.where(found, records, -1), local_starts, local_starts + (ends - starts)
@@ -0,0 +1,86 @@
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import instrumentation
+from image_writer import save_figure
+
+# One instance per template class and options, per process (each pool worker builds its own)
+_templates = {}
+
+
+class FigureTemplate:
+    """A figure whose static parts are drawn once and reused for every file.
+
+    Subclasses implement ``decorate(ax)``, which adds the labels, reference
+    lines, bands, grid and legend and returns the (empty) data artists, and
+    ``update(ax, artists, **data)``, which swaps one file's data into them.
+    ``render`` then only rescales, retitles and saves (see ``image_writer``:
+    PNG and WebP are compressed in the background). The figure is a plain
+    ``Figure`` outside pyplot, so it is never closed and never piles up in
+    pyplot's figure list.
+    """
+
+    figsize = (16, 8)
+
+    def __init__(self, rasterized=False, dpi=300):
+        # Rasterize the data artists (not the decorations) in vector outputs, for very long series
+        self.rasterized = rasterized
+        # Used when the output settings leave the dpi open; None is the figure's own
+        self.dpi = dpi
+        self.fig = None
+        self.ax = None
+        self.artists = None
+
+    @classmethod
+    def get(cls, **options):
+        key = (cls, tuple(sorted(options.items())))
+        if key not in _templates:
+            _templates[key] = cls(**options)
+        return _templates[key]
+
+    def build(self):
+        self.fig = Figure(figsize=self.figsize)
+        # An Agg canvas of its own keeps one renderer buffer for every save, instead of a
+        # temporary canvas (and a new full-size buffer left for the garbage collector) per save
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.subplots()
+        self.artists = self.decorate(self.ax)
+        for artist in self.artists.values():
+            artist.set_rasterized(self.rasterized)
+
+    def decorate(self, ax):
+        raise NotImplementedError
+
+    def update(self, ax, artists, **data):
+        raise NotImplementedError
+
+    def render(self, output_file, title, output=None, **data):
+        # output: the mode's OutputSettings (format, dpi, compression); PNG at self.dpi when None
+        with instrumentation.stage('draw'):
+            if self.fig is None:
+                self.build()
+            self.update(self.ax, self.artists, **data)
+            self.ax.relim()
+            self.ax.autoscale_view()
+            self.ax.set_title(title)
+        with instrumentation.stage('save'):
+            save_figure(self.fig, output_file, output, default_dpi=self.dpi)
+        return output_file
+
+
+def bar_vertices(x, heights, width, bottom=0.0):
+    # Rectangles centred on x, as PolyCollection vertices (one 4-corner polygon per bar)
+    x = np.asarray(x, dtype=float)
+    heights = np.asarray(heights, dtype=float)
+    vertices = np.empty((len(x), 4, 2))
+    vertices[:, [0, 1], 0] = (x - width / 2)[:, None]
+    vertices[:, [2, 3], 0] = (x + width / 2)[:, None]
+    vertices[:, [0, 3], 1] = bottom
+    vertices[:, [1, 2], 1] = heights[:, None]
+    return vertices
+
+
+def clear_templates():
+    # Drop every cached figure, e.g. to free memory after a batch
+    _templates.clear()
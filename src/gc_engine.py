@@ -0,0 +1,109 @@
+import numpy as np
+
+# Base codes used by the engine; anything that is not G/C/A/T (either case) counts as N
+BASES = ('G', 'C', 'A', 'T', 'N')
+BASE_CODES = np.full(256, BASES.index('N'), dtype=np.uint8)
+for _code, _base in enumerate(BASES[:4]):
+    BASE_CODES[ord(_base)] = _code
+    BASE_CODES[ord(_base.lower())] = _code
+
+
+def to_array(sequence):
+    """Return the raw bytes of a sequence as a uint8 array without copying when possible."""
+    if isinstance(sequence, np.ndarray):
+        return sequence.astype(np.uint8, copy=False)
+    if isinstance(sequence, str):
+        sequence = sequence.encode('ascii', errors='replace')
+    return np.frombuffer(sequence, dtype=np.uint8)
+
+
+def encode(sequence):
+    """Map a sequence to base codes (0..4 in ``BASES`` order)."""
+    return BASE_CODES[to_array(sequence)]
+
+
+def interval_counts(sequence, starts, ends, bases=BASES, encoded=False):
+    """Count each base in every ``[start, end)`` interval of ``sequence``.
+
+    Counting is done with one cumulative sum per base, so the cost is
+    O(len(sequence) + len(starts)) however many intervals are requested.
+    Pass ``encoded=True`` when ``sequence`` already holds codes from ``encode``.
+    Returns a dict of int64 arrays keyed by base letter.
+    """
+    codes = sequence if encoded else encode(sequence)
+    starts = np.clip(np.asarray(starts, dtype=np.int64), 0, len(codes))
+    ends = np.clip(np.asarray(ends, dtype=np.int64), starts, len(codes))
+
+    dtype = np.int32 if len(codes) < np.iinfo(np.int32).max else np.int64
+    prefix = np.zeros(len(codes) + 1, dtype=dtype)
+    counts = {}
+    for base in bases:
+        np.cumsum(codes == BASES.index(base), dtype=dtype, out=prefix[1:])
+        counts[base] = (prefix[ends] - prefix[starts]).astype(np.int64)
+    return counts
+
+
+def window_counts(sequence, window_size, step=None):
+    """Count bases in consecutive windows; returns ``(starts, counts)``."""
+    codes = encode(sequence)
+    step = step or window_size
+    starts = np.arange(0, len(codes), step, dtype=np.int64)
+    return starts, interval_counts(codes, starts, starts + window_size, encoded=True)
+
+
+def sequence_counts(sequences):
+    """Count bases in each of many separate sequences in one pass.
+
+    Missing entries (``None``/NaN) produce zero counts.
+    """
+    chunks = [s.encode('ascii', errors='replace') if isinstance(s, str) else
+              bytes(s) if isinstance(s, (bytes, bytearray, memoryview)) else b''
+              for s in sequences]
+    lengths = np.fromiter((len(chunk) for chunk in chunks), dtype=np.int64, count=len(chunks))
+    ends = np.cumsum(lengths)
+    return interval_counts(b''.join(chunks), ends - lengths, ends)
+
+
+def prefix_counts_at(chunks, positions, bases=BASES):
+    """Count each base in ``[0, position)`` for every sorted position, reading the sequence in chunks.
+
+    ``chunks`` yields ``(offset, bases)`` pieces covering the sequence in
+    order. One cumulative sum per chunk serves every position inside it, so
+    only a chunk (not the whole sequence) is ever held as counts; positions
+    past the end get the totals. Returns a dict of int64 arrays keyed by base.
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    counts = {base: np.zeros(len(positions), dtype=np.int64) for base in bases}
+    totals = dict.fromkeys(bases, 0)
+    done = 0
+
+    for offset, chunk in chunks:
+        codes = encode(chunk)
+        last = int(np.searchsorted(positions, offset + len(codes), side='right'))
+        # Positions in a gap before this chunk count nothing from it
+        local = np.clip(positions[done:last] - offset, 0, len(codes))
+        prefix = np.zeros(len(codes) + 1, dtype=np.int64)
+        for base in bases:
+            np.cumsum(codes == BASES.index(base), out=prefix[1:])
+            counts[base][done:last] = totals[base] + prefix[local]
+            totals[base] += int(prefix[-1])
+        done = last
+
+    for base in bases:
+        counts[base][done:] = totals[base]
+    return counts
+
+
+def gc_skew(counts):
+    """(G - C) / (G + C) per interval, 0 where there is no G or C."""
+    g = counts['G'].astype(np.float64)
+    c = counts['C'].astype(np.float64)
+    total = g + c
+    return np.divide(g - c, total, out=np.zeros_like(total), where=total > 0)
+
+
+def gc_content(counts):
+    """GC percentage over called (A/C/G/T) bases per interval, NaN where none are called."""
+    gc = (counts['G'] + counts['C']).astype(np.float64)
+    called = gc + counts['A'] + counts['T']
+    return np.divide(gc * 100, called, out=np.full_like(called, np.nan), where=called > 0)
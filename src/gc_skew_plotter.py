@@ -1,134 +1,419 @@
 import os
-import glob
+import json
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+import gc_engine
+from sequence_cache import SequenceCache
+from fasta_reader import (open_fasta, RecordIntervals, read_fasta, iter_concatenated, numbered, sequence_file_found,
+                          sequence_base_name, safe_record_name, DEFAULT_CHUNK_SIZE)
+from batch_runner import run_batch, BatchPlotter
+from build_manifest import BuildManifest, file_signature
+from segment_loader import load_segments
+from input_scanner import CSV_PREFIXES
+from genome_overview import GenomeOverview
+from figure_template import FigureTemplate
+from image_writer import save_figure
+import image_writer
+import instrumentation
 
+# How segment Starts are placed on the FASTA records (see GCSkewPlotter.record_intervals)
+COORDINATES = ('auto', 'record', 'genome')
+DEFAULT_WINDOW_SIZE = 1000
+# Bases fetched per read in cumulative mode (rounded down to a multiple of the window step)
+STREAM_CHUNK_SIZE = DEFAULT_CHUNK_SIZE
 
-class GCSkewPlotter:
-    def __init__(self, input_dir, output_dir, sequence_file=None):
-        self.input_dir = input_dir
-        self.output_dir = output_dir
+
+class SkewTemplate(FigureTemplate):
+    # GC skew along the segments of one file
+    figsize = (16, 6)
+
+    def decorate(self, ax):
+        line, = ax.plot([], [], color='blue', label='GC Skew')
+        ax.set_xlabel('Start Position')
+        ax.set_ylabel('GC Skew')
+        ax.legend()
+        ax.grid(True)
+        return {'line': line}
+
+    def update(self, ax, artists, starts, skew):
+        artists['line'].set_data(starts, skew)
+
+
+class GCSkewPlotter(BatchPlotter):
+    # Columns read from each segments file; a segment covers [Start, Start + Length) (or [Start, End))
+    SEGMENT_COLUMNS = ['Start', 'End', 'Length']
+    DEFAULT_DPI = 300
+
+    def __init__(self, input_dir, output_dir, sequence_file=None, sequence_cache=None, cache_dir=None,
+                 use_index=False, window_size=DEFAULT_WINDOW_SIZE, window_step=None, coordinates='auto', **options):
+        # jobs, force, output and the other shared options: see BatchPlotter
+        super().__init__(input_dir, output_dir, **options)
         self.sequence_file = sequence_file
-        os.makedirs(self.output_dir, exist_ok=True)
+        # Sliding window used by the cumulative skew mode; step defaults to the window size
+        self.window_size = window_size
+        self.window_step = window_step or window_size
+        # Serve per-record slices from a .fai-indexed mmap instead of loading the whole genome
+        self.use_index = use_index
+        # Shared across runs when passed in; otherwise process_all() creates one per run
+        self.sequence_cache = sequence_cache
+        self.cache_dir = cache_dir
+        # What segment Starts are positions on: 'record', the record the file is named after
+        # (segments_output_chr1.csv -> chr1); 'genome', all records (see RecordIntervals); 'auto', the named
+        # record when there is one, otherwise the genome
+        if coordinates not in COORDINATES:
+            raise ValueError(f"coordinates must be one of {', '.join(COORDINATES)}, not {coordinates}")
+        self.coordinates = coordinates
 
-    def get_files(self):
-        return glob.glob(os.path.join(self.input_dir, 'segments_output_*.csv')) + \
-            glob.glob(os.path.join(self.input_dir, 'merged_segments_output_*.csv'))
+    def manifest_params(self):
+        # The sequence file is an input of every plot, so its signature is part of the parameters
+        params = {'sequence_file': os.path.abspath(self.sequence_file) if self.sequence_file else None,
+                  'use_index': self.use_index, 'output': self.output._asdict(), 'rasterized': self.rasterized,
+                  'coordinates': self.coordinates}
+        if self.sequence_file and os.path.exists(self.sequence_file):
+            params['sequence'] = file_signature(self.sequence_file)
+        return params
 
-    def calculate_gc_skew(self, sequence):
-        g_count = sequence.count('G')
-        c_count = sequence.count('C')
-        if g_count + c_count == 0:
-            return 0
-        return (g_count - c_count) / (g_count + c_count)
+    def cumulative_params(self, records):
+        return {'window_size': self.window_size, 'window_step': self.window_step,
+                'records': list(records) if records else None, 'output': self.output._asdict()}
+
+    def get_files(self):
+        return list(self.inputs().segment_tables)
 
     def load_fna_sequence(self):
-        if not self.sequence_file or not os.path.exists(self.sequence_file):
-            print("⚠️ No sequence file selected or file not found.")
+        if not sequence_file_found(self.sequence_file):
             return None
 
+        if self.sequence_cache is not None:
+            return self.sequence_cache.get(self.sequence_file, self.read_fna_sequence, kind='fasta_records')
+        return self.read_fna_sequence(self.sequence_file)
+
+    def load_sequence_index(self):
+        if not sequence_file_found(self.sequence_file):
+            return None
+
+        if self.sequence_cache is not None:
+            return self.sequence_cache.get(self.sequence_file, self.open_sequence_index,
+                                           kind='fasta_index', persist=False)
+        return self.open_sequence_index(self.sequence_file)
+
+    def open_sequence_index(self, sequence_file):
         try:
-            print(f"🔎 Loading sequence data from {self.sequence_file}...")
-
-            sequences = {}
-            current_sequence = []
-            current_id = None
-
-            # ✅ Read .fna file line-by-line
-            with open(self.sequence_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line.startswith(">"):
-                        if current_id is not None:
-                            sequences[current_id] = "".join(current_sequence)
-                        current_id = line[1:]  # Remove ">"
-                        current_sequence = []
-                    else:
-                        current_sequence.append(line)
-
-                # Add the last sequence
-                if current_id is not None:
-                    sequences[current_id] = "".join(current_sequence)
+            # Plain gzip cannot be sliced, so open_fasta reads it into memory instead
+            index = open_fasta(sequence_file)
+            print(f"✅ Indexed {len(index)} sequences.")
+            return index
+        except Exception as e:
+            print(f"❌ Error indexing sequence file: {e}")
+            return None
 
-            print(f"✅ Loaded {len(sequences)} sequences.")
+    @staticmethod
+    def file_record(file, sequences):
+        # The record a file is named after (segments_output_chr1.csv -> chr1), or None
+        name = os.path.basename(file)[:-len('.csv')]
+        for _, prefix in CSV_PREFIXES:
+            if name.startswith(prefix) and name[len(prefix):] in sequences:
+                return name[len(prefix):]
+        return None
+
+    def record_intervals(self, file, sequences):
+        record = self.file_record(file, sequences) if self.coordinates != 'genome' else None
+        if record is not None:
+            return RecordIntervals.of(sequences, [record])
+        if self.coordinates == 'record':
+            raise ValueError(f"{os.path.basename(file)} is not named after a record of {self.sequence_file}")
+        if self.coordinates == 'auto' and len(sequences) > 1 and not numbered(sequences.names):
+            print(f"⚠️ {os.path.basename(file)} is not named after a record of {self.sequence_file}: its Start "
+                  f"values are read as positions on all {len(sequences)} records laid end to end. Name the file "
+                  f"after its record, or set the coordinates to 'genome' (--coordinates genome) to confirm.")
+        return RecordIntervals.of(sequences)
 
-            # ✅ Create DataFrame from FASTA data
-            sequence_df = pd.DataFrame(list(sequences.items()), columns=['Start', 'Sequence'])
+    def interval_gc_skew(self, df, file, sequences):
+        """GC skew of every segment, resolved against the sequences' coordinates.
 
-            # ✅ Attempt to convert 'Start' to integers (if possible)
-            try:
-                sequence_df['Start'] = sequence_df['Start'].astype(int)
-            except ValueError:
-                print("⚠️ Start values are not numeric; using index-based match instead.")
-                # Create index-based key if Start is not numeric
-                sequence_df['Index'] = range(len(sequence_df))
-                sequence_df.set_index('Index', inplace=True)
+        Each segment's [Start, Start + Length) is located in the sorted record
+        intervals with np.searchsorted, then the records holding segments are
+        streamed once and G/C counts at every segment boundary come from
+        prefix sums. Segments that do not fit inside one record get NaN.
+        """
+        starts = df['Start'].to_numpy(dtype=np.int64)
+        if 'Length' in df.columns:
+            ends = starts + df['Length'].to_numpy(dtype=np.int64)
+        elif 'End' in df.columns:
+            ends = df['End'].to_numpy(dtype=np.int64)
+        else:
+            ends = None
 
-            print(sequence_df.head())
-            return sequence_df
+        intervals = self.record_intervals(file, sequences)
+        records, local_starts, local_ends = intervals.locate(starts, ends)
+        found = records >= 0
+
+        # Lay the records that hold segments end to end and turn every boundary into a position on that stream
+        used = np.unique(records[found])
+        offsets = np.zeros(len(intervals.names), dtype=np.int64)
+        offsets[used] = np.cumsum(intervals.lengths[used]) - intervals.lengths[used]
+        positions = np.concatenate([offsets[records[found]] + local_starts[found],
+                                    offsets[records[found]] + local_ends[found]])
+        order = np.argsort(positions, kind='stable')
+        chunks = iter_concatenated(sequences, [intervals.names[record] for record in used])
+        sorted_counts = gc_engine.prefix_counts_at(chunks, positions[order], bases=('G', 'C'))
+
+        # Back in segment order: the first half are the starts, the second half the ends
+        counts = {}
+        matched = int(found.sum())
+        for base, values in sorted_counts.items():
+            at = np.empty_like(values)
+            at[order] = values
+            counts[base] = at[matched:] - at[:matched]
+
+        skew = np.full(len(df), np.nan)
+        skew[found] = gc_engine.gc_skew(counts)
+        if not found.all():
+            where = f"record {intervals.names[0]}" if len(intervals.names) == 1 else "one sequence record"
+            print(f"⚠️ {(~found).sum():,} of {len(df):,} segments in {os.path.basename(file)} "
+                  f"are not inside {where}; their skew is left empty.")
+        return pd.Series(skew, index=df.index)
+
+    def read_fna_sequence(self, sequence_file):
+        try:
+            print(f"🔎 Loading sequence data from {sequence_file}...")
+            # ✅ Records are kept as bytes, matched to segments by coordinates (see interval_gc_skew)
+            sequences = read_fasta(sequence_file)
+            print(f"✅ Loaded {len(sequences)} sequences.")
+            return sequences
 
         except Exception as e:
             print(f"❌ Error loading sequence file: {e}")
             return None
 
-    def process_and_plot(self, file):
-        try:
-            df = pd.read_csv(file)
-            print(f"\n🔎 Columns in {file}: {df.columns.tolist()}")
-
-            if 'Start' not in df.columns:
-                print(f"⚠️ Skipping {file} - Missing required 'Start' column")
-                return
-
-            # ✅ Load and merge sequence data
-            sequence_data = self.load_fna_sequence()
-            if sequence_data is not None:
-                try:
-                    # Try to merge on 'Start' if it's numeric
-                    if 'Start' in sequence_data.columns:
-                        df = df.merge(sequence_data, on='Start', how='left')
-                    else:
-                        # If merge fails, concatenate using index
-                        df = pd.concat([df, sequence_data], axis=1)
-                except Exception as merge_error:
-                    print(f"⚠️ Merge failed: {merge_error}. Trying index-based match...")
-                    df = pd.concat([df.reset_index(drop=True), sequence_data.reset_index(drop=True)], axis=1)
-
-            if 'Sequence' not in df.columns or df['Sequence'].isna().all():
-                print(f"⚠️ Skipping {file} - No sequence data after merge.")
-                return
-
-            # ✅ Calculate GC Skew
-            df['GC_Skew'] = df['Sequence'].apply(self.calculate_gc_skew)
-
-            # ✅ Plot GC Skew
-            plt.figure(figsize=(16, 6))
-            plt.plot(df['Start'], df['GC_Skew'], color='blue', label='GC Skew')
-
-            plt.title(f'GC Skew - {os.path.basename(file)}')
-            plt.xlabel('Start Position')
-            plt.ylabel('GC Skew')
-            plt.legend()
-            plt.grid(True)
-
-            # ✅ Save plot
-            output_file = os.path.join(self.output_dir, os.path.basename(file).replace('.csv', '_gc_skew.png'))
-            plt.savefig(output_file, format='png', dpi=300)
-            plt.close()
-
-            print(f"✅ GC Skew plot saved to {output_file}")
+    def process_and_plot(self, file, df=None):
+        # df: the file's segments when already loaded (e.g. by SegmentPipeline)
+        if df is None:
+            with instrumentation.stage('load'):
+                df = load_segments(file, self.SEGMENT_COLUMNS, use_cache=self.use_segment_cache)
+        print(f"\n🔎 Columns in {file}: {df.columns.tolist()}")
 
-        except Exception as e:
-            print(f"❌ Error processing {file}: {e}")
+        if 'Start' not in df.columns:
+            print(f"⚠️ Skipping {file} - Missing required 'Start' column")
+            return
 
-    def process_all(self):
+        # ✅ Sequence records from the .fai-indexed mmap, or all of them loaded into memory
+        with instrumentation.stage('sequence'):
+            sequences = self.load_sequence_index() if self.use_index else self.load_fna_sequence()
+        if sequences is None:
+            # No plot can be made, so the file counts as failed
+            raise ValueError(f"no sequence data available from {self.sequence_file}")
+
+        # ✅ Calculate GC Skew per segment interval
+        with instrumentation.stage('compute'):
+            df['GC_Skew'] = self.interval_gc_skew(df, file, sequences)
+        if df['GC_Skew'].isna().all():
+            print(f"⚠️ Skipping {file} - No segment matches the sequence records.")
+            # Nothing to plot, but the file is done until it or the sequence changes
+            return []
+
+        # ✅ Plot GC Skew into the reused, already decorated figure
+        output_file = os.path.join(self.output_dir,
+                                   os.path.basename(file).replace('.csv', '_gc_skew' + self.output.extension))
+        SkewTemplate.get(rasterized=self.rasterized).render(
+            output_file, f'GC Skew - {os.path.basename(file)}', self.output,
+            starts=df['Start'].to_numpy(), skew=df['GC_Skew'].to_numpy(dtype=float))
+
+        print(f"✅ GC Skew plot saved to {output_file}")
+        return output_file
+
+    def process_all(self, progress=None, cancel_event=None):
         files = self.get_files()
         if not files:
             print("⚠️ No matching files found.")
             return
 
-        print("\n🚀 Generating GC Skew plots:")
-        for file in files:
-            self.process_and_plot(file)
+        # ✅ Parse the sequence file once for the whole batch
+        owns_cache = self.sequence_cache is None
+        if owns_cache:
+            self.sequence_cache = SequenceCache(persist_dir=self.cache_dir)
+
+        try:
+            print("\n🚀 Generating GC Skew plots:")
+            manifest = BuildManifest(self.output_dir)
+            params = self.manifest_params()
+            files = manifest.stale_files('gc_skew', sorted(files), params, self.force)
+            results = run_batch(self.process_and_plot, files, self.jobs, progress, cancel_event)
+            manifest.record_results('gc_skew', results, params)
+        finally:
+            if owns_cache:
+                self.sequence_cache = None
 
         print("\n✅ All GC Skew plots have been generated!")
+        return results
+
+    def calculate_cumulative_skew(self, index, name):
+        # Sliding-window skew filled chunk by chunk into preallocated arrays, then one cumsum
+        length = index.length(name)
+        window, step = self.window_size, self.window_step
+        starts = np.arange(0, length, step, dtype=np.int64)
+        skew = np.empty(len(starts), dtype=np.float64)
+
+        chunk_size = max(step, STREAM_CHUNK_SIZE // step * step)
+        for chunk_start in range(0, length, chunk_size):
+            first = chunk_start // step
+            last = min(len(starts), (chunk_start + chunk_size) // step)
+            # Read past the chunk end so windows that straddle it are complete
+            bases = index.fetch(name, chunk_start, chunk_start + (last - first - 1) * step + window)
+            local_starts = starts[first:last] - chunk_start
+            counts = gc_engine.interval_counts(bases, local_starts, local_starts + window, bases=('G', 'C'))
+            skew[first:last] = gc_engine.gc_skew(counts)
+
+        return starts, skew, np.cumsum(skew)
+
+    def summarize_cumulative_skew(self, name, length, starts, skew, cumulative):
+        origin = int(np.argmin(cumulative))
+        terminus = int(np.argmax(cumulative))
+        return {
+            'Record': name,
+            'Length': length,
+            'Window_Size': self.window_size,
+            'Window_Step': self.window_step,
+            'Origin_Position': int(starts[origin]),
+            'Origin_Cumulative_Skew': float(cumulative[origin]),
+            'Terminus_Position': int(starts[terminus]),
+            'Terminus_Cumulative_Skew': float(cumulative[terminus]),
+            'Min_Skew': float(skew.min()),
+            'Max_Skew': float(skew.max()),
+        }
+
+    def plot_cumulative_skew(self, name, starts, skew, cumulative, summary):
+        fig, (ax_skew, ax_cumulative) = plt.subplots(2, 1, figsize=(16, 8), sharex=True)
+
+        ax_skew.plot(starts, skew, color='blue', linewidth=0.5, label='GC Skew')
+        ax_skew.axhline(0, color='black', linewidth=0.5)
+        ax_skew.set_ylabel('GC Skew')
+        ax_skew.legend(loc='upper right')
+        ax_skew.grid(True)
+
+        ax_cumulative.plot(starts, cumulative, color='purple', label='Cumulative GC Skew')
+        ax_cumulative.axvline(summary['Origin_Position'], color='green', linestyle='--',
+                              label=f"Origin ({summary['Origin_Position']:,})")
+        ax_cumulative.axvline(summary['Terminus_Position'], color='red', linestyle='--',
+                              label=f"Terminus ({summary['Terminus_Position']:,})")
+        ax_cumulative.set_xlabel('Position')
+        ax_cumulative.set_ylabel('Cumulative GC Skew')
+        ax_cumulative.legend(loc='upper right')
+        ax_cumulative.grid(True)
+
+        fig.suptitle(f'Cumulative GC Skew - {name} (window {self.window_size}, step {self.window_step})')
+
+        output_file = os.path.join(self.output_dir,
+                                   f"{self.output_prefix(name)}_cumulative_gc_skew{self.output.extension}")
+        # The pixels are copied out before encoding, so the figure can be closed right away
+        save_figure(fig, output_file, self.output)
+        plt.close(fig)
+        print(f"✅ Cumulative GC Skew plot saved to {output_file}")
+        return output_file
+
+    def output_prefix(self, name):
+        return f"{sequence_base_name(self.sequence_file)}_{safe_record_name(name)}"
+
+    def process_cumulative(self, records=None):
+        if not sequence_file_found(self.sequence_file):
+            return
+
+        base = sequence_base_name(self.sequence_file)
+        summary_file = os.path.join(self.output_dir, f"{base}_cumulative_gc_skew_summary")
+
+        manifest = BuildManifest(self.output_dir)
+        params = self.cumulative_params(records)
+        if not manifest.stale_files('cumulative_gc_skew', [self.sequence_file], params, self.force):
+            with open(summary_file + '.json', 'r') as f:
+                return json.load(f)
+
+        index = self.load_sequence_index()
+        if index is None:
+            return
+
+        summaries = []
+        outputs = []
+        print("\n🚀 Generating cumulative GC Skew plots:")
+        for name in records or index.names:
+            if name not in index:
+                print(f"⚠️ Skipping {name} - record not found in {self.sequence_file}")
+                continue
+
+            length = index.length(name)
+            if length == 0:
+                print(f"⚠️ Skipping {name} - empty record")
+                continue
+
+            with instrumentation.stage('compute', name):
+                starts, skew, cumulative = self.calculate_cumulative_skew(index, name)
+            summary = self.summarize_cumulative_skew(name, length, starts, skew, cumulative)
+            with instrumentation.stage('render', name):
+                outputs.append(self.plot_cumulative_skew(name, starts, skew, cumulative, summary))
+            summaries.append(summary)
+            print(f"🧭 {name}: origin ≈ {summary['Origin_Position']:,}, terminus ≈ {summary['Terminus_Position']:,}")
+
+        if not summaries:
+            return
+
+        # Plots still encoding in the background must be on disk before the manifest lists them
+        image_writer.flush()
+
+        # ✅ Save the extrema summary as CSV and JSON
+        pd.DataFrame(summaries).to_csv(summary_file + '.csv', index=False)
+        with open(summary_file + '.json', 'w') as f:
+            json.dump(summaries, f, indent=2)
+        print(f"✅ Cumulative GC Skew summary saved to {summary_file}.csv/.json")
+
+        manifest.record('cumulative_gc_skew', self.sequence_file, params,
+                        outputs + [summary_file + '.csv', summary_file + '.json'])
+        manifest.save()
+        return summaries
+
+    def process_overview(self, records=None):
+        # Cumulative skew of every record in one figure, one panel each, on shared scales
+        if not sequence_file_found(self.sequence_file):
+            return
+
+        base = sequence_base_name(self.sequence_file)
+        output_file = os.path.join(self.output_dir, f"{base}_gc_skew_overview{self.output.extension}")
+
+        manifest = BuildManifest(self.output_dir)
+        params = self.cumulative_params(records)
+        if not manifest.stale_files('gc_skew_overview', [self.sequence_file], params, self.force):
+            return output_file
+
+        index = self.load_sequence_index()
+        if index is None:
+            return
+
+        tracks = []
+        for name in records or index.names:
+            if name not in index or index.length(name) == 0:
+                print(f"⚠️ Skipping {name} - record not found or empty in {self.sequence_file}")
+                continue
+            with instrumentation.stage('compute', name):
+                starts, skew, cumulative = self.calculate_cumulative_skew(index, name)
+            summary = self.summarize_cumulative_skew(name, index.length(name), starts, skew, cumulative)
+            tracks.append({
+                'name': name,
+                'x': starts / 1e6,
+                'y': cumulative,
+                'markers': [(summary['Origin_Position'] / 1e6, summary['Origin_Cumulative_Skew'], 'green'),
+                            (summary['Terminus_Position'] / 1e6, summary['Terminus_Cumulative_Skew'], 'red')],
+            })
+
+        if not tracks:
+            return
+
+        overview = GenomeOverview('Cumulative GC Skew', style='line', baseline=0)
+        try:
+            overview.draw(tracks, f'Cumulative GC Skew - {base} (window {self.window_size}, step {self.window_step}; '
+                                  f'▼ origin green, terminus red)', output_file, self.output)
+            image_writer.flush()
+        finally:
+            overview.close()
+
+        manifest.record('gc_skew_overview', self.sequence_file, params, output_file)
+        manifest.save()
+        return output_file
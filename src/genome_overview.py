@@ -0,0 +1,111 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.collections import PolyCollection
+from figure_template import bar_vertices
+from image_writer import save_figure
+import instrumentation
+
+PANEL_HEIGHT = 0.6
+MIN_HEIGHT = 3
+
+
+class GenomeOverview:
+    """One figure with a panel per chromosome, all sharing the same x (Mb) and y scales.
+
+    Each panel gets one data artist, so a whole genome is a handful of
+    artists rendered in a single save rather than one plot per chromosome.
+    The plotters draw one overview per instance and close it; a later
+    ``draw`` with the same number of chromosomes would only swap the
+    artists' data. ``style`` is 'bars' (a PolyCollection per panel, coloured per bar) or
+    'line' (a Line2D per panel, plus a scatter collection for markers).
+    """
+
+    def __init__(self, ylabel, style='bars', bands=(), baseline=None, width=16, dpi=300):
+        self.ylabel = ylabel
+        self.style = style
+        # (value, color, label) horizontal reference lines drawn on every panel
+        self.bands = bands
+        self.baseline = baseline
+        self.width = width
+        self.dpi = dpi
+        self.fig = None
+        self.panels = []
+
+    def build(self, count):
+        if self.fig is not None:
+            plt.close(self.fig)
+        self.fig = plt.figure(figsize=(self.width, max(MIN_HEIGHT, PANEL_HEIGHT * count + 1.5)), layout='constrained')
+        axes = self.fig.subplots(count, 1, sharex=True, sharey=True, squeeze=False)[:, 0]
+
+        self.panels = []
+        for ax in axes:
+            # Static decorations, drawn when the panels are built
+            for value, color, label in self.bands:
+                ax.axhline(value, color=color, linestyle='--', linewidth=0.5, label=label, zorder=2)
+            if self.baseline is not None:
+                ax.axhline(self.baseline, color='black', linewidth=0.5, zorder=2)
+            ax.grid(True, axis='x', zorder=0)
+            ax.tick_params(axis='y', labelsize=6)
+
+            if self.style == 'bars':
+                artist = PolyCollection([], edgecolors='none', zorder=3)
+                ax.add_collection(artist)
+                markers = None
+            else:
+                artist, = ax.plot([], [], color='purple', linewidth=0.8, zorder=3)
+                markers = ax.scatter([], [], marker='v', s=25, zorder=4)
+            self.panels.append((ax, artist, markers))
+
+        axes[-1].set_xlabel('Position (Mb)')
+        self.fig.supylabel(self.ylabel)
+        if self.bands:
+            axes[0].legend(loc='upper right', fontsize=6, ncol=len(self.bands))
+
+    def draw(self, tracks, title, output_file, output=None):
+        """Render ``tracks`` and save them as one image (``output``: OutputSettings, PNG at self.dpi by default).
+
+        Each track is a dict with 'name', 'x' (Mb), 'y' and optionally
+        'colors' and 'width' (bars) or 'markers' (list of (x, y, color), lines).
+        Returns the saved path.
+        """
+        if self.fig is None or len(self.panels) != len(tracks):
+            self.build(len(tracks))
+
+        x_max = max((float(np.max(track['x'])) for track in tracks if len(track['x'])), default=1.0)
+        y_values = [np.asarray(track['y'], dtype=float) for track in tracks]
+        finite = np.concatenate([values[np.isfinite(values)] for values in y_values] + [np.empty(0)])
+        y_low, y_high = (finite.min(), finite.max()) if len(finite) else (0.0, 1.0)
+        if self.style == 'bars':
+            y_low = min(y_low, 0.0)
+        pad = (y_high - y_low) * 0.05 or 1.0
+
+        for (ax, artist, markers), track, y in zip(self.panels, tracks, y_values):
+            x = np.asarray(track['x'], dtype=float)
+            ax.set_ylabel(track['name'], rotation=0, ha='right', va='center', fontsize=8)
+            if self.style == 'bars':
+                valid = np.isfinite(y)
+                x, y = x[valid], y[valid]
+                artist.set_verts(bar_vertices(x, y, track.get('width', 0.1)))
+                artist.set_facecolors(np.asarray(track['colors'])[valid] if 'colors' in track else 'gray')
+            else:
+                artist.set_data(x, y)
+                points = track.get('markers', [])
+                markers.set_offsets(np.array([(px, py) for px, py, _ in points]).reshape(-1, 2))
+                markers.set_facecolors([color for _, _, color in points])
+
+        # ✅ Shared scales: every chromosome is drawn against the longest one and the same y range
+        ax = self.panels[0][0]
+        ax.set_xlim(0, x_max)
+        ax.set_ylim(y_low - (0 if self.style == 'bars' and y_low == 0 else pad), y_high + pad)
+
+        self.fig.suptitle(title)
+        with instrumentation.stage('save', output_file):
+            save_figure(self.fig, output_file, output, default_dpi=self.dpi)
+        print(f"✅ Genome overview saved to {output_file}")
+        return output_file
+
+    def close(self):
+        if self.fig is not None:
+            plt.close(self.fig)
+        self.fig = None
+        self.panels = []
@@ -1,143 +1,32 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
+import matplotlib
+matplotlib.use('Agg')  # Charts are rendered off the Tk thread and only saved to disk
 from chart_generator import ChartGenerator
 from isochore_plotter import IsochorePlotter
 from scatter_plotter import ScatterPlotter
+from gc_skew_plotter import GCSkewPlotter
+from segment_pipeline import SegmentPipeline
+from input_scanner import scan_inputs
+from image_writer import OutputSettings, OUTPUT_FORMATS
+from figure_template import clear_templates
 import os
+import queue
+import threading
+import subprocess
 
+POLL_INTERVAL_MS = 100
 
-class DNAAnalyzerApp:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("DNA Segment Analyzer")
-        self.root.geometry("600x1400")
-        self.root.configure(bg="#F0F4F8")  # Soft background color
-
-        # ==== Load Logo ====
-        self.load_logo()
-
-        # ==== Title ====
-        tk.Label(root, text="DNA Segment Analyzer", font=("Arial", 22, "bold"), bg="#F0F4F8", fg="#333333").pack(pady=5)
-
-        # ==== Input Directory Button ====
-        self.input_dir = tk.StringVar()
-        self.create_button("Select Input Directory", self.select_input_dir, "icons/folder.png")
-        tk.Label(root, textvariable=self.input_dir, bg="#F0F4F8", fg="#1E88E5", font=("Arial", 10)).pack(pady=2)
-
-        # ==== Output Directory Button ====
-        self.output_dir = tk.StringVar()
-        self.create_button("Select Output Directory", self.select_output_dir, "icons/folder.png")
-        tk.Label(root, textvariable=self.output_dir, bg="#F0F4F8", fg="#1E88E5", font=("Arial", 10)).pack(pady=2)
-
-        # ==== Chart Type Dropdown ====
-        self.mode = tk.StringVar()
-        self.mode.set("Select Mode")
-        self.mode_dropdown = tk.OptionMenu(root, self.mode,
-                                           "Word Frequency Chart",
-                                           "Isochore GC Content Chart",
-                                           "Scatter Plot")
-        self.mode_dropdown.config(width=30, font=("Arial", 12), bg="#FFFFFF", fg="#333333")
-        self.mode_dropdown.pack(pady=10)
-
-        # ==== Generate Button ====
-        self.create_button("Generate Chart", self.generate_chart, "icons/start.png")
-
-        # ==== Status Bar ====
-        self.status_label = tk.Label(root, text="", bg="#F0F4F8", fg="#4CAF50", font=("Arial", 10))
-        self.status_label.pack(pady=5)
-
-    # ==== Load Logo ====
-    def load_logo(self):
-        try:
-            logo = Image.open("icons/dna.png")
-            logo = logo.resize((120, 120), Image.LANCZOS)
-            logo = ImageTk.PhotoImage(logo)
-            tk.Label(self.root, image=logo, bg="#F0F4F8").pack(pady=5)
-            self.root.logo = logo  # Keep reference to avoid garbage collection
-        except Exception as e:
-            print(f"⚠️ Error loading logo: {e}")
-
-    # ==== Create Button with Icon ====
-    def create_button(self, text, command, icon_path):
-        frame = tk.Frame(self.root, bg="#F0F4F8")
-        frame.pack(pady=5)
-
-        try:
-            icon = Image.open(icon_path)
-            icon = icon.resize((20, 20), Image.LANCZOS)
-            icon = ImageTk.PhotoImage(icon)
-        except Exception as e:
-            print(f"⚠️ Error loading icon '{icon_path}': {e}")
-            icon = None
-
-        button = tk.Button(frame, text=text, command=command,
-                           compound="left", padx=10, pady=5,
-                           font=("Arial", 12),
-                           bg="#1E88E5", fg="white", activebackground="#1976D2",
-                           relief="flat", borderwidth=2)
-        button.pack(side="left")
-
-        if icon:
-            button.config(image=icon)
-            button.image = icon  # Keep reference to avoid garbage collection
-
-    def select_input_dir(self):
-        directory = filedialog.askdirectory()
-        if directory:
-            self.input_dir.set(directory)
-
-    def select_output_dir(self):
-        directory = filedialog.askdirectory()
-        if directory:
-            self.output_dir.set(directory)
-
-    def generate_chart(self):
-        input_dir = self.input_dir.get()
-        output_dir = self.output_dir.get()
-        mode = self.mode.get()
-
-        if not input_dir or not output_dir:
-            messagebox.showerror("Error", "Please select both input and output directories.")
-            return
-
-        if mode == "Select Mode":
-            messagebox.showerror("Error", "Please select a chart mode.")
-            return
-
-        try:
-            if mode == "Word Frequency Chart":
-                generator = ChartGenerator(input_dir, output_dir, threshold=20)
-                generator.process_files()
-            elif mode == "Isochore GC Content Chart":
-                plotter = IsochorePlotter(input_dir, output_dir)
-                plotter.process_all()
-            elif mode == "Scatter Plot":
-                scatter_plotter = ScatterPlotter(input_dir, output_dir)
-                scatter_plotter.process_all()
-            else:
-                messagebox.showerror("Error", "Invalid mode selected.")
-                return
-
-            self.status_label.config(text="✅ Chart generated successfully!", fg="#4CAF50")
-
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {e}")
-            self.status_label.config(text=f"❌ Error: {e}", fg="red")
-import tkinter as tk
-from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
-from chart_generator import ChartGenerator
-from isochore_plotter import IsochorePlotter
-from scatter_plotter import ScatterPlotter
-import os
-import subprocess
+# Chart modes offered in the list; the segment ones map to SegmentPipeline mode names
+MODES = ("Word Frequency Chart", "Isochore GC Content Chart", "Scatter Plot", "GC Skew Plot")
+SEGMENT_MODES = {"Word Frequency Chart": 'words', "Scatter Plot": 'scatter', "GC Skew Plot": 'gc_skew'}
 
 class DNAAnalyzerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("DNA Segment Analyzer")
-        self.root.geometry("600x400")
+        self.root.geometry("600x840")
         self.root.configure(bg="#F0F4F8")
 
         # ==== Load Logo ====
@@ -156,18 +45,53 @@ class DNAAnalyzerApp:
         self.create_button("Select Output Directory", self.select_output_dir, "icons/folder.png")
         tk.Label(root, textvariable=self.output_dir, bg="#F0F4F8", fg="#1E88E5", font=("Arial", 10)).pack(pady=2)
 
-        # ==== Chart Type Dropdown ====
-        self.mode = tk.StringVar()
-        self.mode.set("Select Mode")
-        self.mode_dropdown = tk.OptionMenu(root, self.mode,
-                                           "Word Frequency Chart",
-                                           "Isochore GC Content Chart",
-                                           "Scatter Plot")
-        self.mode_dropdown.config(width=30, font=("Arial", 12), bg="#FFFFFF", fg="#333333")
-        self.mode_dropdown.pack(pady=10)
-
-        # ==== Generate Button ====
-        self.create_button("Generate Chart", self.generate_chart, "icons/start.png")
+        # ==== Sequence File Button (GC Skew only) ====
+        self.sequence_file = tk.StringVar()
+        self.create_button("Select Sequence File", self.select_sequence_file, "icons/folder.png")
+        tk.Label(root, textvariable=self.sequence_file, bg="#F0F4F8", fg="#1E88E5", font=("Arial", 10)).pack(pady=2)
+
+        # ==== Chart Types (several at once: segment files are then read only once) ====
+        tk.Label(root, text="Chart modes (select one or more):", bg="#F0F4F8", fg="#333333",
+                 font=("Arial", 10)).pack(pady=(10, 0))
+        self.mode_list = tk.Listbox(root, selectmode=tk.MULTIPLE, exportselection=False, height=len(MODES),
+                                    width=32, font=("Arial", 12), bg="#FFFFFF", fg="#333333",
+                                    selectbackground="#1E88E5", activestyle="none")
+        for mode in MODES:
+            self.mode_list.insert(tk.END, mode)
+        self.mode_list.pack(pady=5)
+
+        # ==== Top Words (Word Frequency only) ====
+        top_k_frame = tk.Frame(root, bg="#F0F4F8")
+        top_k_frame.pack(pady=2)
+        tk.Label(top_k_frame, text="Top words (0 = all with count ≥ 20):", bg="#F0F4F8", fg="#333333",
+                 font=("Arial", 10)).pack(side="left")
+        self.top_k = tk.IntVar(value=0)
+        tk.Spinbox(top_k_frame, from_=0, to=1000, width=6, textvariable=self.top_k).pack(side="left", padx=5)
+
+        # ==== Chart Format (PNG, WebP, or vector SVG/PDF; the HTML scatter plots are unaffected) ====
+        format_frame = tk.Frame(root, bg="#F0F4F8")
+        format_frame.pack(pady=2)
+        tk.Label(format_frame, text="Chart format:", bg="#F0F4F8", fg="#333333",
+                 font=("Arial", 10)).pack(side="left")
+        self.chart_format = tk.StringVar(value=OUTPUT_FORMATS[0])
+        tk.OptionMenu(format_frame, self.chart_format, *OUTPUT_FORMATS).pack(side="left", padx=5)
+
+        # ==== Generate / Cancel Buttons ====
+        self.generate_button = self.create_button("Generate Chart", self.generate_chart, "icons/start.png")
+        self.cancel_button = tk.Button(root, text="Cancel", command=self.cancel_generation,
+                                       font=("Arial", 10), state="disabled", relief="flat")
+        self.cancel_button.pack(pady=2)
+
+        # ==== Progress ====
+        self.progress = ttk.Progressbar(root, orient="horizontal", length=400, mode="determinate")
+        self.progress.pack(pady=5)
+        self.progress_label = tk.Label(root, text="", bg="#F0F4F8", fg="#333333", font=("Arial", 10))
+        self.progress_label.pack(pady=2)
+
+        # Background generation: the worker thread posts events, the Tk loop polls them
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.worker = None
 
         # ==== View Charts Button ====
         self.create_button("View Saved Charts", self.view_charts, "icons/view.png")
@@ -211,11 +135,19 @@ class DNAAnalyzerApp:
             button.config(image=icon)
             button.image = icon
 
+        return button
+
     def select_input_dir(self):
         directory = filedialog.askdirectory()
         if directory:
             self.input_dir.set(directory)
 
+    def select_sequence_file(self):
+        sequence_file = filedialog.askopenfilename(
+            filetypes=[("FASTA files", "*.fna *.fa *.fasta *.fna.gz *.fa.gz *.fasta.gz"), ("All files", "*.*")])
+        if sequence_file:
+            self.sequence_file.set(sequence_file)
+
     def select_output_dir(self):
         directory = filedialog.askdirectory()
         if directory:
@@ -224,35 +156,128 @@ class DNAAnalyzerApp:
     def generate_chart(self):
         input_dir = self.input_dir.get()
         output_dir = self.output_dir.get()
-        mode = self.mode.get()
+        modes = [self.mode_list.get(index) for index in self.mode_list.curselection()]
+        sequence_file = self.sequence_file.get() or None
 
         if not input_dir or not output_dir:
             messagebox.showerror("Error", "Please select both input and output directories.")
             return
 
-        if mode == "Select Mode":
-            messagebox.showerror("Error", "Please select a chart mode.")
+        if not modes:
+            messagebox.showerror("Error", "Please select at least one chart mode.")
+            return
+
+        if "GC Skew Plot" in modes and not sequence_file:
+            messagebox.showerror("Error", "Please select a sequence file for the GC Skew Plot.")
             return
 
         try:
-            if mode == "Word Frequency Chart":
-                generator = ChartGenerator(input_dir, output_dir, threshold=20)
-                generator.process_files()
-            elif mode == "Isochore GC Content Chart":
-                plotter = IsochorePlotter(input_dir, output_dir)
-                plotter.process_all()
-            elif mode == "Scatter Plot":
-                scatter_plotter = ScatterPlotter(input_dir, output_dir)
-                scatter_plotter.process_all()
-            else:
-                messagebox.showerror("Error", "Invalid mode selected.")
-                return
+            top_k = self.top_k.get() or None
+        except tk.TclError:
+            messagebox.showerror("Error", "Top words must be a whole number.")
+            return
 
-            self.status_label.config(text="✅ Chart generated successfully!", fg="#4CAF50")
+        if self.worker is not None and self.worker.is_alive():
+            return
+
+        # ✅ Run the batch off the Tk thread so the window stays responsive
+        self.cancel_event.clear()
+        self.generate_button.config(state="disabled")
+        self.cancel_button.config(state="normal")
+        self.progress.config(value=0, maximum=1)
+        self.progress_label.config(text="Looking for input files...")
+        self.status_label.config(text="⏳ Generating charts...", fg="#1E88E5")
+
+        output = OutputSettings(self.chart_format.get())
+        self.worker = threading.Thread(target=self.run_generation,
+                                       args=(modes, input_dir, output_dir, top_k, sequence_file, output), daemon=True)
+        self.worker.start()
+        self.root.after(POLL_INTERVAL_MS, self.poll_events)
+
+    def run_generation(self, modes, input_dir, output_dir, top_k=None, sequence_file=None, output=None):
+        # Runs on the worker thread: never touch Tk widgets here, only post events
+        def progress(done, total, current_file):
+            self.events.put(('progress', done, total, current_file))
 
+        try:
+            # ✅ One directory scan shared by every selected mode
+            inventory = scan_inputs(input_dir)
+            segment_modes = [SEGMENT_MODES[mode] for mode in modes if mode in SEGMENT_MODES]
+            results = []
+
+            if "Isochore GC Content Chart" in modes:
+                plotter = IsochorePlotter(input_dir, output_dir, inventory=inventory, output=output)
+                results += plotter.process_all(progress, self.cancel_event) or []
+
+            if len(segment_modes) > 1 and not self.cancel_event.is_set():
+                # ✅ Several segment modes: each CSV is read once and shared between them
+                pipeline = SegmentPipeline(input_dir, output_dir, modes=segment_modes, sequence_file=sequence_file,
+                                           inventory=inventory, output=output, options={'words': {'top_k': top_k}})
+                results += pipeline.process_all(progress, self.cancel_event) or []
+            elif segment_modes == ['words']:
+                generator = ChartGenerator(input_dir, output_dir, threshold=20, top_k=top_k, inventory=inventory,
+                                           output=output)
+                results += generator.process_files(progress, self.cancel_event) or []
+            elif segment_modes == ['scatter']:
+                scatter_plotter = ScatterPlotter(input_dir, output_dir, inventory=inventory)
+                results += scatter_plotter.process_all(progress, self.cancel_event) or []
+            elif segment_modes == ['gc_skew']:
+                gc_skew_plotter = GCSkewPlotter(input_dir, output_dir, sequence_file=sequence_file, inventory=inventory,
+                                                output=output)
+                results += gc_skew_plotter.process_all(progress, self.cancel_event) or []
+
+            self.events.put(('done', results))
         except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {e}")
-            self.status_label.config(text=f"❌ Error: {e}", fg="red")
+            self.events.put(('error', e))
+        finally:
+            # Don't keep the last run's figures (and their render buffers) while the window stays open
+            clear_templates()
+
+    def cancel_generation(self):
+        self.cancel_event.set()
+        self.cancel_button.config(state="disabled")
+        self.status_label.config(text="⏹️ Cancelling after the current file...", fg="#FB8C00")
+
+    def poll_events(self):
+        finished = False
+        try:
+            while True:
+                event = self.events.get_nowait()
+                if event[0] == 'progress':
+                    self.show_progress(*event[1:])
+                else:
+                    self.finish_generation(event)
+                    finished = True
+        except queue.Empty:
+            pass
+
+        if not finished:
+            self.root.after(POLL_INTERVAL_MS, self.poll_events)
+
+    def show_progress(self, done, total, current_file):
+        self.progress.config(maximum=max(total, 1), value=done)
+        text = f"{done} of {total} files done, {total - done} remaining"
+        if current_file:
+            text += f"\nCurrent: {os.path.basename(current_file)}"
+        self.progress_label.config(text=text)
+
+    def finish_generation(self, event):
+        self.generate_button.config(state="normal")
+        self.cancel_button.config(state="disabled")
+
+        if event[0] == 'error':
+            messagebox.showerror("Error", f"An error occurred: {event[1]}")
+            self.status_label.config(text=f"❌ Error: {event[1]}", fg="red")
+            return
+
+        results = event[1]
+        failures = [result for result in results if result.error is not None]
+        if self.cancel_event.is_set():
+            self.status_label.config(text=f"⏹️ Cancelled after {len(results)} files.", fg="#FB8C00")
+        elif failures:
+            self.status_label.config(text=f"⚠️ {len(failures)} of {len(results)} files failed.", fg="red")
+        else:
+            self.status_label.config(text="✅ Chart generated successfully!", fg="#4CAF50")
 
     # ==== Open Saved Charts Folder ====
     def view_charts(self):
@@ -282,12 +307,3 @@ def main():
 if __name__ == "__main__":
     main()
 
-
-def main():
-    root = tk.Tk()
-    app = DNAAnalyzerApp(root)
-    root.mainloop()
-
-
-if __name__ == "__main__":
-    main()
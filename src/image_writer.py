@@ -0,0 +1,220 @@
+import os
+import time
+import zlib
+import struct
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+from PIL import Image
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+OUTPUT_FORMATS = ('png', 'webp', 'svg', 'pdf')
+# Formats drawn to a pixel buffer here and compressed on the writer threads
+RASTER_FORMATS = ('png', 'webp')
+# zlib level for PNG (0-9, matplotlib's default is 6); for WebP, which is saved lossless so lines and
+# text stay sharp, it is scaled onto the 0-6 encoder effort instead
+DEFAULT_COMPRESSION = 6
+# Encoder threads per process. PNG filtering and deflate run in numpy and zlib, which release
+# the GIL, so encoding overlaps with drawing the next chart; 0 encodes on the calling thread.
+DEFAULT_WRITERS = 2
+# Finished buffers waiting per writer thread before save_figure blocks (each is a full RGBA frame)
+PENDING_PER_WRITER = 2
+
+
+class OutputSettings(namedtuple('OutputSettings', ['format', 'dpi', 'compression'],
+                                defaults=('png', None, DEFAULT_COMPRESSION))):
+    """How a mode saves its charts: file format, dpi (None: the mode's default) and compression level."""
+
+    __slots__ = ()
+
+    def __new__(cls, format='png', dpi=None, compression=DEFAULT_COMPRESSION):
+        if format not in OUTPUT_FORMATS:
+            raise ValueError(f"output format must be one of {', '.join(OUTPUT_FORMATS)}, not {format}")
+        if not 0 <= compression <= 9:
+            raise ValueError(f"compression must be between 0 and 9, not {compression}")
+        return super().__new__(cls, format, dpi, compression)
+
+    def with_default_dpi(self, dpi):
+        return self if self.dpi is not None else self._replace(dpi=dpi)
+
+    @property
+    def extension(self):
+        return '.' + self.format
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def png_chunk(tag, data):
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+
+
+def encode_png(rgba, output_file, compression, dpi):
+    """Write an RGBA frame as a PNG (RGBA, like matplotlib's own) with the dpi recorded in it.
+
+    Every row gets PNG's 'Up' filter (the difference with the row above),
+    which suits the flat areas and horizontal lines of charts and gives
+    the same sizes as Pillow's per-row choice on them. Unlike Pillow's
+    encoder, numpy and zlib.compress release the GIL for the whole frame.
+    """
+    height, width, _ = rgba.shape
+    pixels = rgba.reshape(height, width * 4)
+    rows = np.empty((height, width * 4 + 1), dtype=np.uint8)
+    rows[:, 0] = 2
+    rows[0, 1:] = pixels[0]
+    np.subtract(pixels[1:], pixels[:-1], out=rows[1:, 1:])
+
+    pixels_per_metre = round(dpi / 0.0254)
+    with open(output_file, 'wb') as f:
+        f.write(PNG_SIGNATURE)
+        f.write(png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)))
+        f.write(png_chunk(b'pHYs', struct.pack('>IIB', pixels_per_metre, pixels_per_metre, 1)))
+        f.write(png_chunk(b'IDAT', zlib.compress(rows, compression)))
+        f.write(png_chunk(b'IEND', b''))
+
+
+def encode(rgba, output_file, settings, dpi):
+    # Returns the wall and CPU seconds spent, measured on the thread that encodes
+    wall, cpu = time.perf_counter(), time.thread_time()
+    if settings.format == 'png':
+        encode_png(rgba, output_file, settings.compression, dpi)
+    else:
+        Image.fromarray(rgba, 'RGBA').save(output_file, 'WEBP', **pil_kwargs(settings))
+    return time.perf_counter() - wall, time.thread_time() - cpu
+
+
+class ImageWriter:
+    """A small thread pool that compresses finished chart buffers while the caller draws the next chart.
+
+    ``save`` rasterizes a figure on the calling thread (figures are reused,
+    so the pixels are copied out first) and queues the encoding. The futures
+    of every queued image are kept until ``take_pending`` hands them to the
+    caller, which waits on them to learn whether the files were written and
+    how long they took to encode.
+    """
+
+    def __init__(self, workers=DEFAULT_WRITERS):
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image_writer') if workers else None
+        self.pending = []
+        self.lock = threading.Lock()
+
+    def save(self, fig, output_file, settings, dpi):
+        rgba = render_rgba(fig, dpi)
+        if self.pool is None:
+            encode(rgba, output_file, settings, dpi)
+            return output_file
+
+        # Bound the frames held in memory: wait for the oldest encodes to finish first
+        with self.lock:
+            running = [future for _, future in self.pending if not future.done()]
+        while len(running) >= self.workers * PENDING_PER_WRITER:
+            wait(running, return_when=FIRST_COMPLETED)
+            running = [future for future in running if not future.done()]
+
+        future = self.pool.submit(encode, rgba, output_file, settings, dpi)
+        with self.lock:
+            self.pending.append((output_file, future))
+        return output_file
+
+    def take_pending(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        return pending
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+
+
+# One writer per process (pool workers build their own after the fork)
+_writer = None
+_writer_pid = None
+_writers = DEFAULT_WRITERS
+
+
+def set_writers(workers):
+    """Number of encoder threads for the writers created from now on (0 encodes inline)."""
+    global _writers, _writer
+    _writers = max(0, workers)
+    if _writer is not None and _writer.workers != _writers:
+        flush()
+        _writer.shutdown()
+        _writer = None
+
+
+def writer_count():
+    return _writers
+
+
+def get_writer():
+    global _writer, _writer_pid
+    if _writer is None or _writer_pid != os.getpid():
+        _writer, _writer_pid = ImageWriter(_writers), os.getpid()
+    return _writer
+
+
+def render_rgba(fig, dpi):
+    """Draw ``fig`` at ``dpi`` and return a copy of its pixels, as savefig would rasterize them."""
+    original = fig.dpi
+    fig.dpi = dpi
+    try:
+        fig.canvas.draw()
+        return np.array(fig.canvas.buffer_rgba())
+    finally:
+        fig.dpi = original
+
+
+def pil_kwargs(settings):
+    # The same encoder options for matplotlib's own savefig
+    if settings.format == 'png':
+        return {'compress_level': settings.compression}
+    if settings.format == 'webp':
+        return {'lossless': True, 'method': round(settings.compression * 6 / 9)}
+    return None
+
+
+def save_figure(fig, output_file, settings=None, default_dpi=None):
+    """Save ``fig`` as ``settings`` asks; PNG and WebP are encoded on the writer threads.
+
+    Vector formats are written before returning. A raster file may still be
+    being written: ``wait_pending``/``flush`` report whether it succeeded.
+    ``default_dpi`` applies when the settings leave the dpi open (None: the
+    figure's own dpi).
+    """
+    settings = settings or OutputSettings()
+    dpi = settings.dpi or default_dpi or fig.dpi
+    if settings.format not in RASTER_FORMATS or not isinstance(fig.canvas, FigureCanvasAgg):
+        # Vector formats (and figures on a non-Agg canvas) are saved by matplotlib right away
+        options = {'pil_kwargs': pil_kwargs(settings)} if settings.format in RASTER_FORMATS else {}
+        fig.savefig(output_file, format=settings.format, dpi=dpi, **options)
+        return output_file
+    return get_writer().save(fig, output_file, settings, dpi)
+
+
+def take_pending():
+    return get_writer().take_pending()
+
+
+def wait_pending(pending):
+    """Wait for the given ``(output_file, future)`` pairs; returns an error message per file that failed."""
+    errors = []
+    for output_file, future in pending:
+        error = future.exception()
+        if error is not None:
+            errors.append(f"{os.path.basename(output_file)}: {type(error).__name__}: {error}")
+    return errors
+
+
+def encode_times(pending):
+    """``(output_file, wall_s, cpu_s)`` for every written image among the given ``(output_file, future)`` pairs."""
+    return [(output_file, *future.result()) for output_file, future in pending if future.exception() is None]
+
+
+def flush():
+    """Wait for every queued image; raises if any of them could not be written."""
+    errors = wait_pending(take_pending())
+    if errors:
+        raise OSError(f"{len(errors)} image(s) not written: {'; '.join(errors)}")
@@ -0,0 +1,71 @@
+import os
+from collections import namedtuple
+
+# File name prefix of each kind of input table. A name is matched against the
+# whole prefix from its first character, so merged_segments_output_ files are
+# never taken for segments_output_ ones.
+CSV_PREFIXES = (
+    ('segments', 'segments_output_'),
+    ('merged_segments', 'merged_segments_output_'),
+    ('isochores', 'isochores_output_'),
+)
+FASTA_SUFFIXES = ('.fna', '.fa', '.fasta', '.fna.gz', '.fa.gz', '.fasta.gz')
+
+# Last scan of each directory, keyed on its path and reused while its mtime is unchanged
+_scans = {}
+
+
+class InputInventory(namedtuple('InputInventory', ['directory', 'segments', 'merged_segments', 'isochores',
+                                                   'fasta', 'other'])):
+    """The files of one input directory by kind, each kind a sorted tuple of paths."""
+
+    __slots__ = ()
+
+    @property
+    def segment_tables(self):
+        # Both kinds of segments table, as read by the scatter and GC skew modes
+        return self.segments + self.merged_segments
+
+    def count(self):
+        return {kind: len(getattr(self, kind)) for kind in self._fields[1:]}
+
+
+def classify(name):
+    """Kind of input a file name is (an InputInventory field), or 'other'."""
+    if name.endswith('.csv'):
+        for kind, prefix in CSV_PREFIXES:
+            if name.startswith(prefix):
+                return kind
+    elif name.lower().endswith(FASTA_SUFFIXES):
+        return 'fasta'
+    return 'other'
+
+
+def scan_inputs(input_dir, rescan=False):
+    """List ``input_dir`` once with os.scandir and sort its files by kind.
+
+    The result is remembered until the directory's mtime changes (a file
+    added, removed or renamed), so several modes run over the same
+    directory in one process share one scan. Sub-directories and hidden
+    files are skipped.
+    """
+    try:
+        mtime = os.stat(input_dir).st_mtime_ns
+    except (OSError, TypeError, ValueError):
+        return InputInventory(input_dir, (), (), (), (), ())
+
+    key = os.path.abspath(input_dir)
+    cached = _scans.get(key)
+    if cached is not None and cached[0] == mtime and not rescan:
+        return cached[1]
+
+    files = {kind: [] for kind in InputInventory._fields[1:]}
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+            files[classify(entry.name)].append(os.path.join(input_dir, entry.name))
+
+    inventory = InputInventory(input_dir, **{kind: tuple(sorted(paths)) for kind, paths in files.items()})
+    _scans[key] = (mtime, inventory)
+    return inventory
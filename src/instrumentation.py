@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Off by default: stage() then costs one check. enable() turns recording on for this process;
+# run_batch passes the switch on to its workers.
+_enabled = False
+_profile_dir = None
+# Finished stage records of this process, and the per-file collectors currently open
+_records = []
+_collectors = []
+
+
+def enable(profile_dir=None):
+    """Record every stage from now on; with ``profile_dir`` also profile the slowest file of each batch."""
+    global _enabled, _profile_dir
+    _enabled = True
+    _profile_dir = profile_dir
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+
+
+def is_enabled():
+    return _enabled
+
+
+def profile_dir():
+    return _profile_dir
+
+
+def records():
+    return list(_records)
+
+
+def add_records(new_records):
+    _records.extend(new_records)
+
+
+def reset():
+    _records.clear()
+
+
+def rss_mb():
+    # Resident memory of this process right now (None where /proc is missing, e.g. macOS and Windows)
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def process_peak_rss_mb():
+    # High-water mark of this process's resident memory since it started, not of any one stage
+    # (None where getrusage is missing)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+@contextmanager
+def recording(file):
+    """Collect the stages run inside the block for ``file``; yields the list they are added to."""
+    collector = {'file': file, 'records': []}
+    _collectors.append(collector)
+    try:
+        yield collector['records']
+    finally:
+        _collectors.remove(collector)
+
+
+def stage_record(name, file, wall_s, cpu_s, rss_before=None, rss_after=None):
+    """One stage record, as ``stage`` writes them; the RSS fields stay None when not measured."""
+    peak = process_peak_rss_mb()
+    return {
+        'file': file,
+        'stage': name,
+        'wall_s': round(wall_s, 6),
+        'cpu_s': round(cpu_s, 6),
+        'rss_mb': round(rss_after, 1) if rss_after is not None else None,
+        'rss_delta_mb': round(rss_after - rss_before, 1) if rss_after is not None and rss_before is not None else None,
+        'process_peak_rss_mb': round(peak, 1) if peak is not None else None,
+        'pid': os.getpid(),
+    }
+
+
+@contextmanager
+def stage(name, file=None):
+    """Time a stage (wall and CPU seconds) and note how the RSS changed over it.
+
+    ``rss_mb`` is the resident memory when the stage ends and ``rss_delta_mb``
+    what the stage added to it; ``process_peak_rss_mb`` is the process-wide
+    high-water mark so far, so it also covers earlier stages and files.
+    """
+    if not _enabled and not _collectors:
+        yield
+        return
+
+    wall, cpu, rss = time.perf_counter(), time.process_time(), rss_mb()
+    try:
+        yield
+    finally:
+        collector = _collectors[-1] if _collectors else None
+        record = stage_record(name, file or (collector['file'] if collector else None),
+                              time.perf_counter() - wall, time.process_time() - cpu, rss, rss_mb())
+        (collector['records'] if collector else _records).append(record)
+
+
+def write_jsonl(path, stage_records=None):
+    with open(path, 'w') as f:
+        for record in _records if stage_records is None else stage_records:
+            f.write(json.dumps(record) + '\n')
+    print(f"✅ Stage timings saved to {path}")
+    return path
+
+
+def summary_table(stage_records=None, slowest=5):
+    """Per-stage totals plus the slowest files, as printable text."""
+    stage_records = _records if stage_records is None else stage_records
+    if not stage_records:
+        return "No stages recorded."
+
+    by_stage = {}
+    for record in stage_records:
+        entry = by_stage.setdefault(record['stage'], {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'delta': None, 'peak': None})
+        entry['count'] += 1
+        entry['wall'] += record['wall_s']
+        entry['cpu'] += record['cpu_s']
+        if record['rss_delta_mb'] is not None:
+            entry['delta'] = max(entry['delta'] or 0, record['rss_delta_mb'])
+        if record['process_peak_rss_mb'] is not None:
+            entry['peak'] = max(entry['peak'] or 0, record['process_peak_rss_mb'])
+
+    lines = [f"{'stage':<14} {'runs':>6} {'wall (s)':>10} {'mean (s)':>10} {'cpu (s)':>10} "
+             f"{'max +RSS (MB)':>14} {'process peak (MB)':>18}"]
+    for name, entry in sorted(by_stage.items(), key=lambda item: -item[1]['wall']):
+        delta = f"{entry['delta']:14.1f}" if entry['delta'] is not None else f"{'-':>14}"
+        peak = f"{entry['peak']:18.1f}" if entry['peak'] is not None else f"{'-':>18}"
+        lines.append(f"{name:<14} {entry['count']:>6} {entry['wall']:10.3f} {entry['wall'] / entry['count']:10.3f} "
+                     f"{entry['cpu']:10.3f} {delta} {peak}")
+
+    totals = [record for record in stage_records if record['stage'] == 'total']
+    if totals:
+        lines.append("")
+        lines.append("Slowest files:")
+        for record in sorted(totals, key=lambda record: -record['wall_s'])[:slowest]:
+            lines.append(f"  {record['wall_s']:8.3f} s  {record['file']}")
+    return '\n'.join(lines)
+
+
+def slowest_file(stage_records):
+    totals = [record for record in stage_records if record['stage'] == 'total']
+    if not totals:
+        return None
+    return max(totals, key=lambda record: record['wall_s'])['file']
+
+
+def profile_call(task, file, directory):
+    """Run ``task(file)`` under cProfile; writes a .prof file and a text report sorted by cumulative time.
+
+    The task runs as given: pass one that writes into a scratch directory
+    (see ``batch_runner``) so the batch's real outputs are left alone.
+    """
+    name = getattr(task, '__name__', 'task')
+    base = os.path.join(directory, f"profile_{name}_{os.path.splitext(os.path.basename(str(file)))[0]}")
+    profiler = cProfile.Profile()
+    try:
+        # The re-run's own stages are left out of the records
+        with recording(file):
+            profiler.runcall(task, file)
+    finally:
+        profiler.dump_stats(base + '.prof')
+        with open(base + '.txt', 'w') as f:
+            pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(40)
+    print(f"✅ Profile of {file} saved to {base}.prof/.txt")
+    return base + '.prof'
@@ -1,7 +1,15 @@
 import os
-import glob
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.collections import PolyCollection
+import gc_engine
+from fasta_reader import open_fasta, sequence_file_found, sequence_base_name, safe_record_name, DEFAULT_CHUNK_SIZE
+from batch_runner import run_batch, BatchPlotter
+from build_manifest import BuildManifest, file_signature
+from genome_overview import GenomeOverview
+from figure_template import FigureTemplate, bar_vertices
+import image_writer
+import instrumentation
 
 # Define isochore class boundaries and colors
 BOUNDARIES = [
@@ -14,6 +22,7 @@ BOUNDARIES = [
 
 DEFAULT_AVG_POINTS = 100
 DEFAULT_MOVING_WINDOW = 50
+DEFAULT_WINDOW_SIZE = 10000
 
 # Function to determine color based on isochore class
 def get_gc_class_color(gc_content):
@@ -29,138 +38,317 @@ def get_gc_class_color(gc_content):
         return 'red'
     return 'gray'
 
-class IsochorePlotter:
-    def __init__(self, input_dir, output_dir, avg_points=DEFAULT_AVG_POINTS, moving_window=DEFAULT_MOVING_WINDOW):
-        self.input_dir = input_dir
-        self.output_dir = output_dir
+# Vectorized equivalent of get_gc_class_color for a whole column
+GC_CLASS_EDGES = [boundary for boundary, _, _ in BOUNDARIES[:-1]]
+GC_CLASS_COLORS = np.array([color for _, color, _ in BOUNDARIES] + ['gray'])
+
+def get_gc_class_colors(gc_values):
+    gc_values = np.asarray(gc_values, dtype=float)
+    classes = np.digitize(gc_values, GC_CLASS_EDGES)
+    classes[np.isnan(gc_values)] = len(BOUNDARIES)
+    return GC_CLASS_COLORS[classes]
+
+# Mean of each consecutive block of block_size values (the last block may be shorter), ignoring NaN
+def block_means(values, block_size):
+    values = np.asarray(values, dtype=float)
+    starts = np.arange(0, len(values), block_size)
+    if len(values) == 0:
+        return starts, np.empty(0)
+    valid = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(valid, values, 0), starts)
+    counts = np.add.reduceat(valid.astype(np.int64), starts)
+    return starts, np.divide(sums, counts, out=np.full(len(starts), np.nan), where=counts > 0)
+
+# Mean of every full window of window_size values, from running sums in O(n), ignoring NaN
+def rolling_mean(values, window_size):
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    window_sums = sums[window_size:] - sums[:-window_size]
+    window_counts = counts[window_size:] - counts[:-window_size]
+    return np.divide(window_sums, window_counts, out=np.full(len(window_sums), np.nan), where=window_counts > 0)
+
+def add_boundary_bands(ax):
+    # Boundary lines are static; the shaded bands follow each file's x range (see set_band_range)
+    for boundary, color, label in BOUNDARIES:
+        ax.axhline(boundary, color=color, linestyle='--', label=label, zorder=2)
+    band_colors = [color for _, color, _ in BOUNDARIES]
+    bands = PolyCollection([], facecolors=band_colors, edgecolors=band_colors, alpha=0.1, zorder=1)
+    ax.add_collection(bands)
+    return bands
+
+def set_band_range(bands, x_min, x_max):
+    bands.set_verts([[(x_min, boundary), (x_min, boundary + 5), (x_max, boundary + 5), (x_max, boundary)]
+                     for boundary, _, _ in BOUNDARIES])
+
+class OriginalTemplate(FigureTemplate):
+    # GC content bars coloured by isochore class
+    def decorate(self, ax):
+        bars = PolyCollection([], edgecolors='none', zorder=3)
+        bars.sticky_edges.y.append(0)
+        ax.add_collection(bars)
+        bands = add_boundary_bands(ax)
+        ax.set_xlabel('Start (Mb)')
+        ax.set_ylabel('GC Content (%)')
+        ax.legend(loc='upper right')
+        ax.grid(True, zorder=0)
+        return {'bars': bars, 'bands': bands}
+
+    def update(self, ax, artists, x, gc, bar_width):
+        if len(x):
+            set_band_range(artists['bands'], np.nanmin(x), np.nanmax(x))
+        valid = ~np.isnan(gc)
+        artists['bars'].set_verts(bar_vertices(x[valid], gc[valid], bar_width))
+        artists['bars'].set_facecolors(get_gc_class_colors(gc[valid]))
+
+class AverageTemplate(FigureTemplate):
+    # The original series in light gray under a simple (steps=True) or moving average
+    def __init__(self, steps=False, **options):
+        self.steps = steps
+        super().__init__(**options)
+
+    def decorate(self, ax):
+        original, = ax.plot([], [], label='GC Content (Original)', color='lightgray', alpha=0.5)
+        average, = ax.plot([], [], color='black', linewidth=2, drawstyle='steps-mid' if self.steps else 'default')
+        bands = add_boundary_bands(ax)
+        ax.set_xlabel('Start (Mb)')
+        ax.set_ylabel('GC Content (%)')
+        ax.grid(True, zorder=0)
+        return {'original': original, 'average': average, 'bands': bands}
+
+    def update(self, ax, artists, x, gc, average_x, average, label):
+        if len(x):
+            set_band_range(artists['bands'], np.nanmin(x), np.nanmax(x))
+        artists['original'].set_data(x, gc)
+        artists['average'].set_data(average_x, average)
+        if artists['average'].get_label() != label:
+            artists['average'].set_label(label)
+            ax.legend(loc='upper right')
+
+class HistogramTemplate(FigureTemplate):
+    # Distribution of GC content in 50 bins
+    def decorate(self, ax):
+        bars = PolyCollection([], facecolors='skyblue', edgecolors='black', linewidths=1)
+        bars.sticky_edges.y.append(0)
+        ax.add_collection(bars)
+        for boundary, color, label in BOUNDARIES:
+            ax.axvline(boundary, color=color, linestyle='--', label=label)
+        ax.set_xlabel('GC Content (%)')
+        ax.set_ylabel('Frequency')
+        ax.legend(loc='upper right')
+        ax.grid(True)
+        return {'bars': bars}
+
+    def update(self, ax, artists, gc):
+        counts, edges = np.histogram(gc[~np.isnan(gc)], bins=50)
+        artists['bars'].set_verts(bar_vertices((edges[:-1] + edges[1:]) / 2, counts, edges[1] - edges[0]))
+
+class IsochorePlotter(BatchPlotter):
+    DEFAULT_DPI = 300
+
+    def __init__(self, input_dir, output_dir, avg_points=DEFAULT_AVG_POINTS, moving_window=DEFAULT_MOVING_WINDOW,
+                 sequence_file=None, window_size=DEFAULT_WINDOW_SIZE, **options):
+        # jobs, force, output and the other shared options: see BatchPlotter
+        super().__init__(input_dir, output_dir, **options)
         self.avg_points = avg_points
         self.moving_window = moving_window
-        os.makedirs(self.output_dir, exist_ok=True)
+        # Genome mode: compute the isochore table from a FASTA instead of reading isochores_output_ files
+        self.sequence_file = sequence_file
+        self.window_size = window_size
 
     def get_files(self):
-        file_pattern = os.path.join(self.input_dir, 'isochores_output_*.csv')
-        files = glob.glob(file_pattern)
+        files = list(self.inputs().isochores)
         if not files:
             print("⚠️ No files found in the input directory.")
         return files
 
-    def plot_original(self, df, file):
-        plt.figure(figsize=(16, 8))
+    def manifest_params(self):
+        return {'avg_points': self.avg_points, 'moving_window': self.moving_window, 'output': self.output._asdict(),
+                'rasterized': self.rasterized}
+
+    def calculate_gc_content(self, sequence, window_size, offset=0):
+        # GC content (%) for consecutive windows of a sequence, as an isochores_output_ table
+        starts, counts = gc_engine.window_counts(sequence, window_size)
+        return pd.DataFrame({'Start': starts + offset, 'GC_Content': gc_engine.gc_content(counts)})
+
+    def compute_from_genome(self):
+        if not sequence_file_found(self.sequence_file):
+            return []
+
+        manifest = BuildManifest(self.output_dir)
+        params = {'window_size': self.window_size}
+        if not manifest.stale_files('isochore_table', [self.sequence_file], params, self.force):
+            return manifest.outputs('isochore_table', self.sequence_file)
+
+        base = sequence_base_name(self.sequence_file)
+        # Whole windows per chunk, so no window straddles two reads
+        chunk_size = max(self.window_size, DEFAULT_CHUNK_SIZE // self.window_size * self.window_size)
+        files = []
+
+        with open_fasta(self.sequence_file) as index:
+            for name in index.names:
+                if index.length(name) == 0:
+                    print(f"⚠️ Skipping {name} - empty record")
+                    continue
+                output_file = os.path.join(self.output_dir,
+                                           f"isochores_output_{base}_{safe_record_name(name)}_{self.window_size}.csv")
+                print(f"🔎 Computing GC content for {name} ({index.length(name):,} bp)...")
+
+                # ✅ Stream the record chunk by chunk, appending each chunk's windows to the table
+                with instrumentation.stage('compute', name), open(output_file, 'w', newline='') as f:
+                    header = True
+                    for chunk_start, bases in index.iter_chunks(name, chunk_size):
+                        table = self.calculate_gc_content(bases, self.window_size, offset=chunk_start)
+                        table.to_csv(f, index=False, header=header)
+                        header = False
+
+                print(f"✅ Isochore table saved to {output_file}")
+                files.append(output_file)
+
+        manifest.record('isochore_table', self.sequence_file, params, files)
+        manifest.save()
+        return files
+
+    def process_genome(self, progress=None, cancel_event=None):
+        return self.plot_files(self.compute_from_genome(), progress, cancel_event)
 
-        colors = [get_gc_class_color(gc) for gc in df['GC_Content']]
+    def plot_files(self, files, progress=None, cancel_event=None):
+        manifest = BuildManifest(self.output_dir)
+        params = self.manifest_params()
+        files = manifest.stale_files('isochore', files, params, self.force)
+        results = run_batch(self.process_and_plot, files, self.jobs, progress, cancel_event)
+        manifest.record_results('isochore', results, params)
+        return results
+
+    def overview_track(self, file):
+        df = pd.read_csv(file)
+        name = os.path.basename(file).replace('.csv', '')
+        if name.startswith('isochores_output_'):
+            name = name[len('isochores_output_'):]
+        x = df['Start'].to_numpy(dtype=float) / 1e6
+        width = 0.9 * (x[1] - x[0]) if len(x) > 1 else 0.1
+        return {'name': name, 'x': x, 'y': df['GC_Content'].to_numpy(dtype=float),
+                'colors': get_gc_class_colors(df['GC_Content']), 'width': width}
+
+    def process_overview(self):
+        # One figure for the whole genome: a panel per isochore table (chromosome), shared scales
+        if self.sequence_file:
+            files = self.compute_from_genome()
+            base = sequence_base_name(self.sequence_file)
+        else:
+            files = sorted(self.get_files())
+            base = 'isochores'
+        if not files:
+            return None
+
+        manifest = BuildManifest(self.output_dir)
+        # Keyed on the genome (or input directory); the tables' signatures make the parameters change with them
+        source = self.sequence_file or self.input_dir
+        params = {'files': {os.path.abspath(file): file_signature(file) for file in files},
+                  'output': self.output._asdict()}
+        if not manifest.stale_files('isochore_overview', [source], params, self.force):
+            return manifest.outputs('isochore_overview', source)[0]
+
+        overview = GenomeOverview('GC Content (%)', style='bars', bands=[(b, c, l) for b, c, l in BOUNDARIES[:-1]])
+        output_file = os.path.join(self.output_dir, f"{base}_isochore_overview{self.output.extension}")
+        try:
+            with instrumentation.stage('load', source):
+                tracks = [self.overview_track(file) for file in files]
+            overview.draw(tracks,
+                          f'GC Content - {base} ({len(files)} sequences)', output_file, self.output)
+            image_writer.flush()
+        finally:
+            overview.close()
+
+        manifest.record('isochore_overview', source, params, output_file)
+        manifest.save()
+        return output_file
+
+    def output_file(self, file, suffix):
+        # isochores_output_X.csv -> isochores_output_X<suffix>.<format> in the output directory
+        return os.path.join(self.output_dir, os.path.basename(file).replace('.csv', suffix + self.output.extension))
+
+    def plot_original(self, df, file):
         if len(df) > 1:
             bar_width = 0.9 * (df['Start (Mb)'].iloc[1] - df['Start (Mb)'].iloc[0])
         else:
             bar_width = 0.1
 
-        for i in range(len(df)):
-            plt.bar(
-                df['Start (Mb)'].iloc[i],
-                df['GC_Content'].iloc[i],
-                width=bar_width,
-                color=colors[i],
-                edgecolor=None,
-                zorder=3
-            )
-
-        for boundary, color, label in BOUNDARIES:
-            plt.axhline(boundary, color=color, linestyle='--', label=label, zorder=2)
-            plt.fill_between(df['Start (Mb)'], boundary, boundary + 5, color=color, alpha=0.1, zorder=1)
-
-        plt.title(f'GC Content - {os.path.basename(file)} (Original)')
-        plt.xlabel('Start (Mb)')
-        plt.ylabel('GC Content (%)')
-        plt.legend(loc='upper right')
-        plt.grid(True, zorder=0)
-
-        output_file = os.path.join(self.output_dir, f"{os.path.basename(file).replace('.csv', '_original.png')}")
-        plt.savefig(output_file, format='png', dpi=300)
-        plt.close()
+        output_file = self.output_file(file, '_original')
+        # ✅ Reuse the decorated figure; only the bar collection changes per file
+        OriginalTemplate.get(rasterized=self.rasterized).render(
+            output_file, f'GC Content - {os.path.basename(file)} (Original)', self.output,
+            x=df['Start (Mb)'].to_numpy(dtype=float), gc=df['GC_Content'].to_numpy(dtype=float), bar_width=bar_width)
         print(f"✅ Original plot saved to {output_file}")
+        return output_file
 
     def plot_simple_average(self, df, file):
-        avg_points = min(self.avg_points, len(df))
-        avg_gc_content = [
-            df['GC_Content'].iloc[i:i + avg_points].mean()
-            for i in range(0, len(df), avg_points)
-        ]
-        avg_start = [
-            df['Start'].iloc[i]
-            for i in range(0, len(df), avg_points)
-        ]
-        avg_end = [
-            df['Start'].iloc[min(i + avg_points - 1, len(df) - 1)]
-            for i in range(0, len(df), avg_points)
-        ]
+        avg_points = max(1, min(self.avg_points, len(df)))
+        block_starts, avg_gc_content = block_means(df['GC_Content'], avg_points)
+        avg_start = df['Start'].to_numpy()[block_starts]
 
-        plt.figure(figsize=(16, 8))
-        plt.plot(df['Start (Mb)'], df['GC_Content'], label='GC Content (Original)', color='lightgray', alpha=0.5)
+        output_file = self.output_file(file, '_simple_average')
+        AverageTemplate.get(steps=True, rasterized=self.rasterized).render(
+            output_file, f'GC Content - {os.path.basename(file)} (Simple Average)', self.output,
+            x=df['Start (Mb)'].to_numpy(), gc=df['GC_Content'].to_numpy(dtype=float),
+            average_x=avg_start / 1e6, average=avg_gc_content, label=f'Simple Average ({avg_points} points)')
+        print(f"✅ Simple average plot saved to {output_file}")
+        return output_file
 
-        plt.step(
-            [x / 1e6 for x in avg_start],
-            avg_gc_content,
-            label=f'Simple Average ({avg_points} points)',
-            color='black',
-            linewidth=2,
-            where='mid'
-        )
+    def plot_moving_average(self, df, file):
+        moving_window = max(1, min(self.moving_window, len(df)))
+        moving_avg = rolling_mean(df['GC_Content'], moving_window)
+        # Each mean is drawn at the centre of its window
+        centers = df['Start (Mb)'].to_numpy()[moving_window // 2:moving_window // 2 + len(moving_avg)]
 
-        for boundary, color, label in BOUNDARIES:
-            plt.axhline(boundary, color=color, linestyle='--', label=label, zorder=2)
-            plt.fill_between(df['Start (Mb)'], boundary, boundary + 5, color=color, alpha=0.1, zorder=1)
-
-        plt.title(f'GC Content - {os.path.basename(file)} (Simple Average)')
-        plt.xlabel('Start (Mb)')
-        plt.ylabel('GC Content (%)')
-        plt.legend(loc='upper right')
-        plt.grid(True, zorder=0)
-
-        output_file = os.path.join(self.output_dir, f"{os.path.basename(file).replace('.csv', '_simple_average.png')}")
-        plt.savefig(output_file, format='png', dpi=300)
-        plt.close()
-        print(f"✅ Simple average plot saved to {output_file}")
+        output_file = self.output_file(file, '_moving_average')
+        AverageTemplate.get(steps=False, rasterized=self.rasterized).render(
+            output_file, f'GC Content - {os.path.basename(file)} (Moving Average)', self.output,
+            x=df['Start (Mb)'].to_numpy(), gc=df['GC_Content'].to_numpy(dtype=float),
+            average_x=centers, average=moving_avg, label=f'Moving Average ({moving_window} points)')
+        print(f"✅ Moving average plot saved to {output_file}")
+        return output_file
 
     def plot_histogram(self, df, file):
-        plt.figure(figsize=(16, 8))
-
+        output_file = self.output_file(file, '_histogram')
         # ✅ Histogram of GC Content distribution
-        plt.hist(
-            df['GC_Content'],
-            bins=50,
-            color='skyblue',
-            edgecolor='black'
-        )
-
-        for boundary, color, label in BOUNDARIES:
-            plt.axvline(boundary, color=color, linestyle='--', label=label)
-
-        plt.title(f'GC Content Distribution - {os.path.basename(file)}')
-        plt.xlabel('GC Content (%)')
-        plt.ylabel('Frequency')
-        plt.legend(loc='upper right')
-        plt.grid(True)
-
-        output_file = os.path.join(self.output_dir, f"{os.path.basename(file).replace('.csv', '_histogram.png')}")
-        plt.savefig(output_file, format='png', dpi=300)
-        plt.close()
+        HistogramTemplate.get(rasterized=self.rasterized).render(
+            output_file, f'GC Content Distribution - {os.path.basename(file)}', self.output,
+            gc=df['GC_Content'].to_numpy(dtype=float))
         print(f"✅ Histogram saved to {output_file}")
+        return output_file
 
     def process_and_plot(self, file):
-        df = pd.read_csv(file)
+        with instrumentation.stage('load'):
+            df = pd.read_csv(file)
+        if df.empty:
+            # Nothing to draw, but the table is done until it changes
+            print(f"⚠️ Skipping {file} - no GC content windows")
+            return []
         df['Start (Mb)'] = df['Start'] / 1e6
 
-        self.plot_original(df, file)
-        self.plot_simple_average(df, file)
-        self.plot_histogram(df, file)
+        return [
+            self.plot_original(df, file),
+            self.plot_simple_average(df, file),
+            self.plot_moving_average(df, file),
+            self.plot_histogram(df, file),
+        ]
 
-    def process_all(self):
+    def process_all(self, progress=None, cancel_event=None):
         files = self.get_files()
         if not files:
             print("⚠️ No files matched the pattern.")
             return
-        for file in files:
-            self.process_and_plot(file)
+        return self.plot_files(sorted(files), progress, cancel_event)
 
 # Example usage:
 # plotter = IsochorePlotter('path_to_input', 'path_to_output', avg_points=100, moving_window=50)
 # plotter.process_all()
+#
+# Or straight from a genome:
+# plotter = IsochorePlotter('path_to_input', 'path_to_output', sequence_file='genome.fna', window_size=10000)
+# plotter.process_genome()
+#
+# All chromosomes in one figure:
+# plotter.process_overview()
@@ -1,8 +1,257 @@
-from gui import main as gui_main
+import argparse
+import multiprocessing
+import sys
 
-def main():
+# Plotter modules are imported inside the command handlers so that --help and
+# headless runs never load tkinter, PIL or plotly unless the mode needs them.
+
+
+def use_headless_backend():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {value}")
+    return value
+
+
+def plotter_options(args, *names):
+    # Only pass options given on the command line, so the plotters' own defaults apply
+    return {name: getattr(args, name) for name in names if getattr(args, name) is not None}
+
+
+def output_settings(args):
+    # Chart format, dpi and compression for the image modes; unset options keep each mode's defaults
+    import image_writer
+    if args.writers is not None:
+        image_writer.set_writers(args.writers)
+    return image_writer.OutputSettings(**plotter_options(args, 'format', 'dpi', 'compression'))
+
+
+def run_gui(args):
+    from gui import main as gui_main
     print("\n🔎 Launching GUI interface...")
     gui_main()
 
+
+def run_words(args):
+    use_headless_backend()
+    from chart_generator import ChartGenerator
+    generator = ChartGenerator(args.input_dir, args.output_dir, threshold=args.threshold, jobs=args.jobs,
+                               force=args.force, use_segment_cache=args.use_segment_cache,
+                               streaming=args.streaming, combined=args.combined, rasterized=args.rasterized,
+                               output=output_settings(args),
+                               **plotter_options(args, 'chunk_rows', 'top_k'))
+    return generator.process_files()
+
+
+def run_isochore(args):
+    use_headless_backend()
+    from isochore_plotter import IsochorePlotter
+    plotter = IsochorePlotter(args.input_dir, args.output_dir, jobs=args.jobs, force=args.force,
+                              rasterized=args.rasterized, output=output_settings(args),
+                              **plotter_options(args, 'avg_points', 'moving_window', 'sequence_file', 'window_size'))
+    if args.overview:
+        plotter.process_overview()
+        return None
+    if args.sequence_file:
+        return plotter.process_genome()
+    return plotter.process_all()
+
+
+def run_scatter(args):
+    use_headless_backend()
+    from scatter_plotter import ScatterPlotter
+    plotter = ScatterPlotter(args.input_dir, args.output_dir, jobs=args.jobs, force=args.force,
+                             use_segment_cache=args.use_segment_cache, shared_plotlyjs=args.shared_plotlyjs,
+                             **plotter_options(args, 'lod', 'max_points', 'points_per_bin', 'max_file_mb'))
+    return plotter.process_all()
+
+
+def run_gc_skew(args):
+    use_headless_backend()
+    from gc_skew_plotter import GCSkewPlotter
+    plotter = GCSkewPlotter(args.input_dir, args.output_dir, sequence_file=args.sequence_file,
+                            cache_dir=args.cache_dir, use_index=args.use_index, jobs=args.jobs, force=args.force,
+                            use_segment_cache=args.use_segment_cache, rasterized=args.rasterized,
+                            output=output_settings(args),
+                            **plotter_options(args, 'window_size', 'window_step', 'coordinates'))
+    if args.overview:
+        plotter.process_overview(args.records)
+        return None
+    if args.cumulative:
+        plotter.process_cumulative(args.records)
+        return None
+    return plotter.process_all()
+
+
+def run_pipeline(args):
+    use_headless_backend()
+    from segment_pipeline import SegmentPipeline
+    # Command names to pipeline mode names
+    modes = ['gc_skew' if mode == 'gcskew' else mode for mode in args.modes]
+    options = {
+        'words': plotter_options(args, 'threshold', 'top_k'),
+        'scatter': dict(plotter_options(args, 'lod', 'max_points', 'max_file_mb'), shared_plotlyjs=args.shared_plotlyjs),
+        'gc_skew': dict(plotter_options(args, 'cache_dir', 'coordinates'), use_index=args.use_index),
+    }
+    try:
+        pipeline = SegmentPipeline(args.input_dir, args.output_dir, modes=modes, sequence_file=args.sequence_file,
+                                   jobs=args.jobs, force=args.force, use_segment_cache=args.use_segment_cache,
+                                   rasterized=args.rasterized, output=output_settings(args), options=options)
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+    return pipeline.process_all()
+
+
+# Keep in sync with segment_loader.CACHE_DIR_NAME and gc_skew_plotter.COORDINATES (not imported so --help stays light)
+CACHE_DIR_NAME = '.segments_cache'
+COORDINATES = ('auto', 'record', 'genome')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='dna_chart_app',
+        description="DNA Chart App - generate DNA segment charts. Run without a command to open the GUI."
+    )
+    commands = parser.add_subparsers(dest='command', metavar='command')
+
+    gui = commands.add_parser('gui', help="open the graphical interface")
+    gui.set_defaults(handler=run_gui)
+
+    def add_mode(name, handler, help_text, segments=True, images=True):
+        mode = commands.add_parser(name, help=help_text, description=help_text)
+        mode.add_argument('input_dir', help="directory with the input files")
+        mode.add_argument('output_dir', help="directory the charts are written to")
+        mode.add_argument('-j', '--jobs', type=int, default=1,
+                          help="worker processes for the batch (0 = one per CPU, default: 1)")
+        mode.add_argument('--force', action='store_true',
+                          help="rebuild every output, even those whose inputs and options are unchanged")
+        mode.add_argument('--stats', metavar='JSONL',
+                          help="record wall time, CPU time and RSS per stage and file into this JSON lines file")
+        mode.add_argument('--stats-summary', action='store_true',
+                          help="print a per-stage timing summary and the slowest files at the end")
+        mode.add_argument('--profile', metavar='DIR',
+                          help="run the slowest file again under cProfile and save the profile in DIR")
+        if images:
+            mode.add_argument('--format', choices=['png', 'webp', 'svg', 'pdf'],
+                              help="chart file format (default: png); svg and pdf are vector")
+            mode.add_argument('--rasterized', action='store_true',
+                              help="svg/pdf: draw the data series as an embedded image at --dpi, keeping text "
+                                   "and axes vector (much smaller files for long series)")
+            mode.add_argument('--dpi', type=int, help="resolution of png/webp charts (default: the mode's own)")
+            mode.add_argument('--compression', type=int, choices=range(10), metavar='0-9',
+                              help="png zlib level, or webp encoder effort (default: 6); lower is faster and larger")
+            mode.add_argument('--writers', type=int,
+                              help="threads compressing png/webp charts while the next one is drawn "
+                                   "(default: 2, 0 = compress inline)")
+        if segments:
+            mode.add_argument('--no-segment-cache', dest='use_segment_cache', action='store_false',
+                              help=f"don't keep a columnar copy of each parsed CSV in {CACHE_DIR_NAME}/")
+        mode.set_defaults(handler=handler)
+        return mode
+
+    words = add_mode('words', run_words, "word frequency bar charts from segments_output_ CSV files")
+    words.add_argument('--threshold', type=int, default=20,
+                       help="minimum count for a word to be charted (default: 20)")
+    words.add_argument('--top-k', type=positive_int, metavar='K',
+                       help="chart the K most frequent words plus an 'other' bar, and export a sorted counts table")
+    words.add_argument('--combined', action='store_true',
+                       help="one chart and counts table for all files instead of one chart per file")
+    words.add_argument('--stream', dest='streaming', action='store_const', const=True,
+                       help="count words in chunks even for small files (default: only files over 256 MB)")
+    words.add_argument('--chunk-rows', type=int, help="rows per chunk when counting in chunks")
+
+    isochore = add_mode('isochore', run_isochore, "isochore GC content charts from isochores_output_ CSV files",
+                        segments=False)
+    isochore.add_argument('--avg-points', type=int, help="points per block in the simple average plot")
+    isochore.add_argument('--moving-window', type=int, help="points per window in the moving average plot")
+    isochore.add_argument('--genome', dest='sequence_file', metavar='FASTA',
+                          help="compute the isochore tables from this FASTA instead of reading CSV files")
+    isochore.add_argument('--window-size', type=int, help="bases per GC content window with --genome")
+    isochore.add_argument('--overview', action='store_true',
+                          help="one figure with a panel per chromosome (shared scales) instead of plots per file")
+
+    scatter = add_mode('scatter', run_scatter, "interactive Start/Length scatter plots (HTML) from segments CSV files",
+                       images=False)
+    scatter.add_argument('--lod', choices=['full', 'auto', 'sample', 'density'],
+                         help="level of detail: every point (default), sample only above --max-points, "
+                              "always sample per word and position bin, or a 2D density heatmap")
+    scatter.add_argument('--max-points', type=int, help="most points per plot when sampling (default: 200000)")
+    scatter.add_argument('--points-per-bin', type=int,
+                         help="points kept per Best Word and position bin when sampling (default: from --max-points)")
+    scatter.add_argument('--max-file-mb', type=float,
+                         help="sample down, and finally switch to a heatmap, to keep each HTML file under this size")
+    scatter.add_argument('--shared-plotlyjs', action='store_true',
+                         help="write one plotly.min.js next to the plots instead of embedding it in every file")
+
+    gc_skew = add_mode('gcskew', run_gc_skew, "GC skew plots from segments CSV files and a FASTA sequence")
+    gc_skew.add_argument('--sequence', dest='sequence_file', metavar='FASTA', required=True,
+                         help="FASTA (.fna, or .fna.gz) file with the sequences")
+    gc_skew.add_argument('--use-index', action='store_true',
+                         help="read sequence slices through a .fai index instead of loading the whole file")
+    gc_skew.add_argument('--cache-dir', help="keep parsed sequences here between runs")
+    gc_skew.add_argument('--coordinates', choices=COORDINATES,
+                         help="what segment Starts are positions on: 'record', the record each file is named after "
+                              "(segments_output_chr1.csv -> chr1); 'genome', all records end to end (or at their "
+                              "numeric names); 'auto' (default), the named record when there is one")
+    gc_skew.add_argument('--cumulative', action='store_true',
+                         help="plot sliding-window and cumulative skew per record and predict origin/terminus")
+    gc_skew.add_argument('--overview', action='store_true',
+                         help="cumulative skew of every record in one figure, a panel per record on shared scales")
+    gc_skew.add_argument('--window-size', type=int, help="bases per window with --cumulative/--overview")
+    gc_skew.add_argument('--window-step', type=int, help="bases between window starts with --cumulative/--overview")
+    gc_skew.add_argument('--records', nargs='+', metavar='NAME', help="only these records with --cumulative/--overview")
+
+    pipeline = add_mode('pipeline', run_pipeline,
+                        "several segment modes (words, scatter, gcskew) in one pass, reading each CSV once")
+    pipeline.add_argument('--modes', nargs='+', choices=['words', 'scatter', 'gcskew'],
+                          default=['words', 'scatter', 'gcskew'], help="modes to run (default: all three)")
+    pipeline.add_argument('--sequence', dest='sequence_file', metavar='FASTA',
+                          help="FASTA (.fna, or .fna.gz) file with the sequences, needed for gcskew")
+    pipeline.add_argument('--use-index', action='store_true',
+                          help="gcskew: read sequence slices through a .fai index instead of loading the whole file")
+    pipeline.add_argument('--cache-dir', help="gcskew: keep parsed sequences here between runs")
+    pipeline.add_argument('--coordinates', choices=COORDINATES,
+                          help="gcskew: what segment Starts are positions on (record, genome or auto, see gcskew)")
+    pipeline.add_argument('--threshold', type=int, help="words: minimum count for a word to be charted (default: 20)")
+    pipeline.add_argument('--top-k', type=positive_int, metavar='K', help="words: chart the K most frequent words plus 'other'")
+    pipeline.add_argument('--lod', choices=['full', 'auto', 'sample', 'density'], help="scatter: level of detail")
+    pipeline.add_argument('--max-points', type=int, help="scatter: most points per plot when sampling")
+    pipeline.add_argument('--max-file-mb', type=float, help="scatter: keep each HTML file under this size")
+    pipeline.add_argument('--shared-plotlyjs', action='store_true',
+                          help="scatter: write one plotly.min.js next to the plots instead of embedding it")
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        run_gui(args)
+        return 0
+
+    instrument = args.stats or args.stats_summary or args.profile
+    if instrument:
+        import instrumentation
+        instrumentation.enable(profile_dir=args.profile)
+
+    results = args.handler(args)
+
+    if instrument:
+        if args.stats:
+            instrumentation.write_jsonl(args.stats)
+        if args.stats_summary or args.profile:
+            print("\n" + instrumentation.summary_table())
+
+    failures = [result for result in results or [] if result.error is not None]
+    return 1 if failures else 0
+
+
 if __name__ == "__main__":
-    main()
+    # Needed for process-pool batches in the frozen (PyInstaller) build
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,26 +1,231 @@
 import os
-import glob
+import html
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs
+from batch_runner import run_batch, BatchPlotter
+from build_manifest import BuildManifest
+from segment_loader import load_segments
+import instrumentation
 
-class ScatterPlotter:
-    def __init__(self, input_dir, output_dir):
-        self.input_dir = input_dir
-        self.output_dir = output_dir
-        os.makedirs(self.output_dir, exist_ok=True)
+# Level of detail: 'full' plots every segment, 'sample' keeps a fixed number of points per
+# Best Word and Start bin, 'density' bins everything into a 2D heatmap, 'auto' samples only
+# when a file has more than max_points segments
+LOD_MODES = ('full', 'auto', 'sample', 'density')
+DEFAULT_MAX_POINTS = 200_000
+DEFAULT_POSITION_BINS = 100
+DEFAULT_DENSITY_BINS = (400, 200)
+# Same cut-off plotly express uses for render_mode='auto'
+WEBGL_MIN_POINTS = 1000
+SAMPLE_SEED = 0
+# Attempts at shrinking the point sample before falling back to a heatmap under max_file_mb
+MAX_SHRINK_ATTEMPTS = 4
+# Written next to the plots when they share one plotly.js bundle
+PLOTLYJS_NAME = 'plotly.min.js'
+INDEX_NAME = 'index.html'
+
+
+def position_bins_of(start, position_bins):
+    # Equal-width bins over the Start range, numbered 0 .. position_bins - 1
+    if not len(start):
+        return np.zeros(0, dtype=np.int64)
+    span = max(int(start.max()) - int(start.min()), 1)
+    return np.minimum((start - start.min()) * position_bins // span, position_bins - 1)
+
+
+def sample_points(df, points_per_bin, position_bins=DEFAULT_POSITION_BINS, max_points=None, seed=SAMPLE_SEED):
+    """Keep at most ``points_per_bin`` random rows per (Best Word, Start bin) group, in file order.
+
+    With more groups than ``max_points`` a uniform random ``max_points`` of those rows is kept.
+    """
+    position_bin = position_bins_of(df['Start'].to_numpy(), position_bins)
+
+    # Shuffle first so head() takes a random subset of each group; the seed keeps re-runs identical
+    order = np.random.default_rng(seed).permutation(len(df))
+    shuffled = df.iloc[order].assign(_bin=position_bin[order])
+    keys = ['Best Word', '_bin'] if 'Best Word' in df.columns else ['_bin']
+    sampled = shuffled.groupby(keys, observed=True, sort=False).head(points_per_bin)
+    if max_points is not None:
+        sampled = sampled.iloc[:max_points]
+    return sampled.drop(columns='_bin').sort_index()
+
+
+def points_per_bin_for(df, max_points, position_bins=DEFAULT_POSITION_BINS):
+    # Even share of max_points over the non-empty (Best Word, Start bin) groups
+    groups = pd.DataFrame({'bin': position_bins_of(df['Start'].to_numpy(), position_bins)})
+    if 'Best Word' in df.columns:
+        groups['word'] = df['Best Word'].to_numpy()
+    return max(1, max_points // max(len(groups.drop_duplicates()), 1))
+
+
+class ScatterPlotter(BatchPlotter):
+    # Columns read from each segments file
+    SEGMENT_COLUMNS = ['Start', 'Length', 'Best Word']
+
+    def __init__(self, input_dir, output_dir, lod='full', max_points=DEFAULT_MAX_POINTS, points_per_bin=None,
+                 position_bins=DEFAULT_POSITION_BINS, density_bins=DEFAULT_DENSITY_BINS, max_file_mb=None,
+                 shared_plotlyjs=False, **options):
+        # jobs, force, inventory and the other shared options: see BatchPlotter
+        super().__init__(input_dir, output_dir, **options)
+        if lod not in LOD_MODES:
+            raise ValueError(f"lod must be one of {', '.join(LOD_MODES)}, not {lod!r}")
+        # Level of detail (see LOD_MODES) and its knobs; points_per_bin=None derives it from max_points
+        self.lod = lod
+        self.max_points = max_points
+        self.points_per_bin = points_per_bin
+        self.position_bins = position_bins
+        self.density_bins = tuple(density_bins)
+        # Resample (and finally switch to a heatmap) until each HTML file is at most this many MB
+        self.max_file_mb = max_file_mb
+        # Reference one plotly.min.js in the output directory instead of embedding ~4.6 MB in every file
+        self.shared_plotlyjs = shared_plotlyjs
 
     def get_files(self):
-        return glob.glob(os.path.join(self.input_dir, 'segments_output_*.csv')) + \
-            glob.glob(os.path.join(self.input_dir, 'merged_segments_output_*.csv'))
-
-    def process_and_plot(self, file):
-        df = pd.read_csv(file)
-        fig = px.scatter(df, x='Start', y='Length', color='Best Word')
-        output_file = os.path.join(self.output_dir, os.path.basename(file).replace('.csv', '.html'))
-        fig.write_html(output_file)
+        return list(self.inputs().segment_tables)
+
+    def manifest_params(self):
+        return {'lod': self.lod, 'max_points': self.max_points, 'points_per_bin': self.points_per_bin,
+                'position_bins': self.position_bins, 'density_bins': self.density_bins,
+                'max_file_mb': self.max_file_mb, 'shared_plotlyjs': self.shared_plotlyjs}
+
+    def include_plotlyjs(self):
+        # 'directory' makes the page load plotly.min.js from its own folder, so it still works offline
+        return 'directory' if self.shared_plotlyjs else True
+
+    def output_path(self, file):
+        return os.path.join(self.output_dir, os.path.basename(file).replace('.csv', '.html'))
+
+    def write_plotlyjs(self):
+        bundle = get_plotlyjs()
+        bundle_file = os.path.join(self.output_dir, PLOTLYJS_NAME)
+        # Rewritten when missing or left over from another plotly version
+        if not os.path.exists(bundle_file) or os.path.getsize(bundle_file) != len(bundle.encode('utf-8')):
+            temporary = f"{bundle_file}.{os.getpid()}.tmp"
+            with open(temporary, 'w', encoding='utf-8') as f:
+                f.write(bundle)
+            os.replace(temporary, bundle_file)
+        return bundle_file
+
+    def write_index(self, files):
+        # One page linking every scatter plot in the output directory
+        plots = [self.output_path(file) for file in sorted(files) if os.path.exists(self.output_path(file))]
+        links = '\n'.join(
+            f'    <li><a href="{html.escape(os.path.basename(plot))}">{html.escape(os.path.basename(plot))}</a></li>'
+            for plot in plots)
+        index_file = os.path.join(self.output_dir, INDEX_NAME)
+        with open(index_file, 'w', encoding='utf-8') as f:
+            f.write(f"""<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <title>Scatter plots</title>
+</head>
+<body>
+  <h1>Scatter plots ({len(plots)})</h1>
+  <ul>
+{links}
+  </ul>
+</body>
+</html>
+""")
+        print(f"✅ Index of {len(plots)} scatter plots saved to {index_file}")
+        return index_file
+
+    def scatter_figure(self, df, title, total=None):
+        # ✅ WebGL (scattergl) keeps large point clouds responsive in the browser
+        render_mode = 'webgl' if len(df) > WEBGL_MIN_POINTS else 'svg'
+        fig = px.scatter(df, x='Start', y='Length', color='Best Word' if 'Best Word' in df.columns else None,
+                         render_mode=render_mode)
+        if total is not None and total > len(df):
+            fig.update_layout(title=f"{title} - {len(df):,} of {total:,} segments (sampled)")
+        return fig
+
+    def density_figure(self, df, title):
+        # Binned here, so the HTML only carries the bin counts, not the segments
+        x_bins, y_bins = self.density_bins
+        counts, x_edges, y_edges = np.histogram2d(df['Start'].to_numpy(), df['Length'].to_numpy(),
+                                                  bins=(x_bins, y_bins))
+        fig = go.Figure(go.Heatmap(
+            z=np.where(counts.T > 0, counts.T, np.nan),
+            x=(x_edges[:-1] + x_edges[1:]) / 2,
+            y=(y_edges[:-1] + y_edges[1:]) / 2,
+            colorscale='Viridis',
+            colorbar=dict(title='Segments'),
+            hovertemplate='Start %{x:.0f}<br>Length %{y:.0f}<br>%{z:.0f} segments<extra></extra>',
+        ))
+        fig.update_layout(title=f"{title} - density of {len(df):,} segments", xaxis_title='Start',
+                          yaxis_title='Length', plot_bgcolor='white')
+        return fig
+
+    def sampled_figure(self, df, title, max_points, points_per_bin=None):
+        points_per_bin = points_per_bin or points_per_bin_for(df, max_points, self.position_bins)
+        sampled = sample_points(df, points_per_bin, self.position_bins, max_points)
+        return self.scatter_figure(sampled, title, total=len(df)), len(sampled)
+
+    def build_figure(self, df, title):
+        if df.empty or self.lod == 'density':
+            return (self.density_figure(df, title) if not df.empty else self.scatter_figure(df, title)), None
+        if self.lod == 'full' or (self.lod == 'auto' and len(df) <= self.max_points):
+            return self.scatter_figure(df, title), len(df)
+        return self.sampled_figure(df, title, self.max_points, self.points_per_bin)
+
+    def fit_file_size(self, df, title, fig, points):
+        # Shrink the sample in proportion to the overshoot; a heatmap is the last resort
+        max_bytes = self.max_file_mb * 1024 * 1024
+        include_plotlyjs = self.include_plotlyjs()
+        page = fig.to_html(include_plotlyjs=include_plotlyjs)
+        overhead = len(go.Figure().to_html(include_plotlyjs=include_plotlyjs))
+        attempts = 0
+        while len(page) > max_bytes and points and attempts < MAX_SHRINK_ATTEMPTS:
+            ratio = max(max_bytes - overhead, 0) / max(len(page) - overhead, 1)
+            target = int(points * ratio * 0.9)
+            if target < 1:
+                break
+            fig, points = self.sampled_figure(df, title, target)
+            page = fig.to_html(include_plotlyjs=include_plotlyjs)
+            attempts += 1
+
+        if len(page) > max_bytes and points is not None:
+            print(f"⚠️ {title}: still over {self.max_file_mb} MB with points, writing a density heatmap instead.")
+            page = self.density_figure(df, title).to_html(include_plotlyjs=include_plotlyjs)
+        if len(page) > max_bytes:
+            print(f"⚠️ {title}: {len(page) / 1024 / 1024:.1f} MB is over the {self.max_file_mb} MB cap.")
+        return page
+
+    def process_and_plot(self, file, df=None):
+        # df: the file's segments when already loaded (e.g. by SegmentPipeline)
+        if df is None:
+            with instrumentation.stage('load'):
+                df = load_segments(file, self.SEGMENT_COLUMNS, use_cache=self.use_segment_cache)
+        title = os.path.basename(file)
+        with instrumentation.stage('draw'):
+            fig, points = self.build_figure(df, title)
+        output_file = self.output_path(file)
+        with instrumentation.stage('save'):
+            if self.max_file_mb:
+                page = self.fit_file_size(df, title, fig, points)
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    f.write(page)
+            else:
+                fig.write_html(output_file, include_plotlyjs=self.include_plotlyjs())
         print(f"✅ Scatter plot saved to {output_file}")
+        if self.shared_plotlyjs:
+            # Listed as an output so the manifest rebuilds the plots if the bundle goes missing
+            return [output_file, os.path.join(self.output_dir, PLOTLYJS_NAME)]
+        return output_file
 
-    def process_all(self):
-        files = self.get_files()
-        for file in files:
-            self.process_and_plot(file)
+    def process_all(self, progress=None, cancel_event=None):
+        manifest = BuildManifest(self.output_dir)
+        params = self.manifest_params()
+        all_files = sorted(self.get_files())
+        files = manifest.stale_files('scatter', all_files, params, self.force)
+        if self.shared_plotlyjs and files:
+            # ✅ Written once here, before the workers start, instead of by every write_html call
+            self.write_plotlyjs()
+        results = run_batch(self.process_and_plot, files, self.jobs, progress, cancel_event)
+        manifest.record_results('scatter', results, params)
+        if all_files:
+            self.write_index(all_files)
+        return results
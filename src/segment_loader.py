@@ -0,0 +1,154 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+# Explicit dtypes for the columns of segments_output_ / merged_segments_output_ files
+SEGMENT_DTYPES = {
+    'Start': 'int64',
+    'End': 'int64',
+    'Length': 'int64',
+    'Cost': 'float64',
+    'Best Word': 'category',
+}
+
+CACHE_DIR_NAME = '.segments_cache'
+CACHE_META_NAME = 'meta.json'
+
+
+def cache_path(file, cache_dir=None):
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(file)), CACHE_DIR_NAME)
+    return os.path.join(cache_dir, os.path.splitext(os.path.basename(file))[0])
+
+
+def column_file_name(column):
+    return ''.join(ch if ch.isalnum() else '_' for ch in column)
+
+
+def read_segments_csv(file, columns=None):
+    """Read only ``columns`` (all when None) with explicit dtypes; text columns become categoricals."""
+    available = pd.read_csv(file, nrows=0).columns.tolist()
+    usecols = available if columns is None else [column for column in columns if column in available]
+    dtypes = {column: SEGMENT_DTYPES[column] for column in usecols if column in SEGMENT_DTYPES}
+
+    try:
+        df = pd.read_csv(file, usecols=usecols, dtype=dtypes)
+    except (ValueError, TypeError):
+        # e.g. missing values in an integer column: let pandas infer, keep the categorical
+        df = pd.read_csv(file, usecols=usecols,
+                         dtype={column: dtype for column, dtype in dtypes.items() if dtype == 'category'})
+
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].astype('category')
+    return df[usecols]
+
+
+class SegmentCache:
+    """Columnar sidecar cache of one segments CSV: one .npy file per column.
+
+    Categorical columns are stored as integer codes plus a categories array,
+    so nothing needs pickling. The cache is dropped when the CSV's size or
+    mtime changes, and columns are added as they are first requested.
+    """
+
+    def __init__(self, file, cache_dir=None):
+        self.file = file
+        self.path = cache_path(file, cache_dir)
+        self.meta_file = os.path.join(self.path, CACHE_META_NAME)
+        stat = os.stat(file)
+        self.signature = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        self.meta = self._load_meta()
+
+    def _load_meta(self):
+        try:
+            with open(self.meta_file, 'r') as f:
+                meta = json.load(f)
+            if meta.get('signature') == self.signature:
+                return meta
+        except (OSError, ValueError):
+            pass
+        return {'signature': self.signature, 'available': None, 'columns': {}}
+
+    def _save_meta(self):
+        temporary = f"{self.meta_file}.{os.getpid()}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(temporary, self.meta_file)
+
+    def _save_array(self, name, values):
+        target = os.path.join(self.path, name + '.npy')
+        temporary = f"{target}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            np.save(f, values, allow_pickle=False)
+        os.replace(temporary, target)
+
+    def _load_array(self, name):
+        return np.load(os.path.join(self.path, name + '.npy'), allow_pickle=False)
+
+    def read(self, columns):
+        """Return the cached subset of ``columns`` (possibly empty), or None before the first write."""
+        if self.meta['available'] is None:
+            return None
+        columns = [column for column in columns if column in self.meta['columns']]
+
+        data = {}
+        for column in columns:
+            name = column_file_name(column)
+            if self.meta['columns'][column] == 'category':
+                categories = self._load_array(name + '.categories')
+                data[column] = pd.Categorical.from_codes(self._load_array(name + '.codes'), categories)
+            else:
+                data[column] = self._load_array(name)
+        return pd.DataFrame(data, columns=columns)
+
+    def write(self, df, available):
+        os.makedirs(self.path, exist_ok=True)
+        for column in df.columns:
+            name = column_file_name(column)
+            if isinstance(df[column].dtype, pd.CategoricalDtype):
+                categories = df[column].cat.categories.to_numpy()
+                self._save_array(name + '.categories', categories.astype(str) if categories.dtype == object
+                                 else categories)
+                self._save_array(name + '.codes', df[column].cat.codes.to_numpy())
+                self.meta['columns'][column] = 'category'
+            else:
+                self._save_array(name, df[column].to_numpy())
+                self.meta['columns'][column] = str(df[column].dtype)
+        self.meta['available'] = available
+        self._save_meta()
+
+
+def load_segments(file, columns=None, use_cache=True, cache_dir=None):
+    """Load a segments CSV with explicit dtypes, going through the columnar cache when possible.
+
+    Requested columns that the file does not have are simply absent from
+    the result, so callers can keep checking ``df.columns``.
+    """
+    if not use_cache:
+        return read_segments_csv(file, columns)
+
+    cached = None
+    try:
+        cache = SegmentCache(file, cache_dir)
+        available = cache.meta['available']
+        if available is not None:
+            wanted = [column for column in (columns or available) if column in available]
+            cached = cache.read(wanted)
+            if len(cached.columns) == len(wanted):
+                return cached
+    except (OSError, ValueError):
+        cache = None
+
+    # ✅ Parse only the columns the cache does not have yet
+    missing = columns if cached is None else [column for column in wanted if column not in cached.columns]
+    df = read_segments_csv(file, missing)
+    if cache is not None:
+        try:
+            cache.write(df, available or pd.read_csv(file, nrows=0).columns.tolist())
+        except OSError as e:
+            print(f"⚠️ Could not cache {file}: {e}")
+
+    if cached is not None and len(cached.columns):
+        df = pd.concat([cached, df], axis=1)[wanted]
+    return df
@@ -0,0 +1,132 @@
+from batch_runner import run_batch, BatchResult, BatchPlotter
+from build_manifest import BuildManifest
+from segment_loader import load_segments
+from sequence_cache import SequenceCache
+import instrumentation
+
+# Modes that read segments_output_ / merged_segments_output_ files, in the order they run per file
+SEGMENT_MODES = ('words', 'scatter', 'gc_skew')
+
+
+class SegmentPipeline(BatchPlotter):
+    """Several segment modes over one input directory, loading each file once.
+
+    Every segments file is read a single time, with the union of the columns
+    the selected modes need, and the same frame is handed to ChartGenerator,
+    ScatterPlotter and GCSkewPlotter in turn. Each mode keeps its own
+    manifest entries, so a file is only loaded when at least one mode has
+    something to rebuild for it, and only those modes run. The shared options
+    (``jobs``, ``force``, ``output``, ... see BatchPlotter) apply to every
+    mode; ``options`` holds extra constructor arguments per mode, e.g.
+    ``{'words': {'top_k': 30}}``.
+    """
+
+    def __init__(self, input_dir, output_dir, modes=SEGMENT_MODES, sequence_file=None, options=None, **shared):
+        unknown = [mode for mode in modes if mode not in SEGMENT_MODES]
+        if unknown:
+            raise ValueError(f"modes must be among {', '.join(SEGMENT_MODES)}, not {', '.join(unknown)}")
+        if 'gc_skew' in modes and not sequence_file:
+            raise ValueError("the gc_skew mode needs a sequence file")
+
+        super().__init__(input_dir, output_dir, **shared)
+        self.modes = [mode for mode in SEGMENT_MODES if mode in modes]
+        # Scanned once here, so every mode works from the same files
+        self.inventory = self.inputs()
+        # Modes each file still needs, filled in by process_all
+        self.pending = {}
+
+        options = options or {}
+        shared = self.batch_options()
+        self.plotters = {}
+        if 'words' in self.modes:
+            from chart_generator import ChartGenerator
+            words_options = {'threshold': 20, **shared, **options.get('words', {})}
+            self.plotters['words'] = ChartGenerator(input_dir, output_dir, **words_options)
+        if 'scatter' in self.modes:
+            from scatter_plotter import ScatterPlotter
+            self.plotters['scatter'] = ScatterPlotter(input_dir, output_dir, **{**shared, **options.get('scatter', {})})
+        if 'gc_skew' in self.modes:
+            from gc_skew_plotter import GCSkewPlotter
+            self.plotters['gc_skew'] = GCSkewPlotter(input_dir, output_dir, sequence_file=sequence_file,
+                                                     **{**shared, **options.get('gc_skew', {})})
+
+    def columns(self, modes):
+        columns = []
+        for mode in modes:
+            columns += [column for column in self.plotters[mode].SEGMENT_COLUMNS if column not in columns]
+        return columns
+
+    def run_mode(self, mode, file, df):
+        # Each mode gets its own column selection, so none sees another's added columns
+        plotter = self.plotters[mode]
+        frame = df[[column for column in plotter.SEGMENT_COLUMNS if column in df.columns]]
+        if mode == 'words':
+            return plotter.create_chart(file, frame)
+        return plotter.process_and_plot(file, frame)
+
+    def process_file(self, file):
+        """Load ``file`` once and run every pending mode on it; returns a BatchResult per mode."""
+        modes = self.pending.get(file, self.modes)
+        with instrumentation.stage('load'):
+            df = load_segments(file, self.columns(modes), use_cache=self.use_segment_cache)
+
+        results = {}
+        for mode in modes:
+            try:
+                results[mode] = BatchResult(file, self.run_mode(mode, file, df), None)
+            except Exception as e:
+                # One mode failing doesn't stop the others for this file
+                results[mode] = BatchResult(file, None, f"{type(e).__name__}: {e}")
+        return results
+
+    def process_all(self, progress=None, cancel_event=None):
+        files = list(self.inventory.segment_tables)
+        if not files:
+            print("⚠️ No matching files found.")
+            return
+
+        manifest = BuildManifest(self.output_dir)
+        params = {mode: plotter.manifest_params() for mode, plotter in self.plotters.items()}
+        self.pending = {}
+        for mode in self.modes:
+            for file in manifest.stale_files(mode, files, params[mode], self.force):
+                self.pending.setdefault(file, []).append(mode)
+        stale = [file for file in files if file in self.pending]
+        print(f"\n🚀 Running {', '.join(self.modes)} over {len(stale)} of {len(files)} segments files "
+              f"(each loaded once):")
+
+        scatter = self.plotters.get('scatter')
+        if scatter is not None and scatter.shared_plotlyjs and any('scatter' in self.pending[f] for f in stale):
+            scatter.write_plotlyjs()
+
+        # ✅ The sequence file is parsed once for the whole batch, as GCSkewPlotter.process_all does
+        gc_skew = self.plotters.get('gc_skew')
+        owns_cache = gc_skew is not None and gc_skew.sequence_cache is None
+        if owns_cache:
+            gc_skew.sequence_cache = SequenceCache(persist_dir=gc_skew.cache_dir)
+        try:
+            batch = run_batch(self.process_file, stale, self.jobs, progress, cancel_event)
+        finally:
+            if owns_cache:
+                gc_skew.sequence_cache = None
+
+        # One result per file and mode; a file that failed to load fails every mode it needed
+        results = []
+        for mode in self.modes:
+            mode_results = []
+            for result in batch:
+                if mode not in self.pending[result.file]:
+                    continue
+                if result.error is not None:
+                    mode_results.append(result._replace(result=None))
+                    continue
+                if result.result[mode].error is not None:
+                    print(f"❌ {mode} failed for {result.file}: {result.result[mode].error}")
+                mode_results.append(result.result[mode])
+            manifest.record_results(mode, mode_results, params[mode])
+            results += mode_results
+
+        if scatter is not None:
+            scatter.write_index(files)
+        print("\n✅ All pipeline outputs have been generated!")
+        return results
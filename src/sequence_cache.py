@@ -0,0 +1,88 @@
+import os
+import pickle
+import hashlib
+import uuid
+
+# Entries of every cache unpickled in this process, by cache token. Process-pool
+# workers receive a fresh copy of the cache with each task; this lets those
+# copies share what earlier tasks in the same worker already loaded.
+_process_entries = {}
+
+
+class SequenceCache:
+    """Keeps loaded sequence files around so a batch parses each genome only once.
+
+    Entries are keyed by absolute path, file size and mtime, so an edited or
+    replaced file is reloaded automatically. When ``persist_dir`` is given,
+    picklable results are also written there and reused by later runs.
+    """
+
+    def __init__(self, persist_dir=None):
+        self.persist_dir = persist_dir
+        self.token = uuid.uuid4().hex
+        self._entries = {}
+        if self.persist_dir:
+            os.makedirs(self.persist_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(path, kind):
+        stat = os.stat(path)
+        return kind, os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def get(self, path, loader, kind='sequence', persist=True):
+        key = self.make_key(path, kind)
+        if key in self._entries:
+            return self._entries[key]
+
+        value = self._load_persisted(key) if persist else None
+        if value is None:
+            value = loader(path)
+            if value is not None and persist:
+                self._persist(key, value)
+
+        self._entries[key] = value
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def __getstate__(self):
+        # Loaded entries stay in the process that loaded them
+        return {'persist_dir': self.persist_dir, 'token': self.token}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._entries = _process_entries.setdefault(self.token, {})
+
+    def _persisted_path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.persist_dir, f"{key[0]}_{digest}.pkl")
+
+    def _load_persisted(self, key):
+        if not self.persist_dir:
+            return None
+
+        cache_file = self._persisted_path(key)
+        if not os.path.exists(cache_file):
+            return None
+
+        try:
+            with open(cache_file, 'rb') as f:
+                value = pickle.load(f)
+            print(f"♻️ Reusing cached {key[0]} for {key[1]}")
+            return value
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable cache file {cache_file}: {e}")
+            return None
+
+    def _persist(self, key, value):
+        if not self.persist_dir:
+            return
+
+        cache_file = self._persisted_path(key)
+        try:
+            with open(cache_file + '.tmp', 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(cache_file + '.tmp', cache_file)
+        except Exception as e:
+            print(f"⚠️ Could not persist cache file {cache_file}: {e}")
@@ -0,0 +1,9 @@
+import os
+import sys
+
+import matplotlib
+
+# The modules live flat in src/, as main.py imports them
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+matplotlib.use('Agg')
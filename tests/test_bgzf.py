@@ -0,0 +1,72 @@
+import gzip
+import os
+
+import numpy as np
+import pytest
+
+from bgzf import BgzfReader, BLOCK_DATA_SIZE, build_block_index, is_bgzf, is_gzip, read_gzi, write_bgzf
+
+
+@pytest.fixture
+def data():
+    # Several blocks' worth, with a short last block
+    rng = np.random.default_rng(0)
+    return bytes(rng.choice(np.frombuffer(b'ACGTN\n', dtype=np.uint8), size=3 * BLOCK_DATA_SIZE + 1234))
+
+
+@pytest.fixture
+def bgzf_file(tmp_path, data):
+    source = tmp_path / 'genome.fna'
+    source.write_bytes(data)
+    target = str(tmp_path / 'genome.fna.gz')
+    write_bgzf(str(source), target)
+    return target
+
+
+def test_write_bgzf_is_read_back_by_gzip(bgzf_file, data):
+    assert is_gzip(bgzf_file) and is_bgzf(bgzf_file)
+    with gzip.open(bgzf_file, 'rb') as f:
+        assert f.read() == data
+
+
+def test_plain_gzip_is_not_bgzf(tmp_path, data):
+    path = str(tmp_path / 'plain.fna.gz')
+    with gzip.open(path, 'wb') as f:
+        f.write(data)
+    assert is_gzip(path) and not is_bgzf(path)
+
+
+@pytest.mark.parametrize('start, stop', [
+    (0, 10),
+    (BLOCK_DATA_SIZE - 5, BLOCK_DATA_SIZE + 5),   # across a block boundary
+    (100, 2 * BLOCK_DATA_SIZE + 100),             # spanning a whole block
+    (3 * BLOCK_DATA_SIZE, 3 * BLOCK_DATA_SIZE + 1234),
+    (3 * BLOCK_DATA_SIZE + 1000, 10 ** 9),        # past the end
+    (500, 500),
+])
+def test_reader_slices_match_gzip(bgzf_file, data, start, stop):
+    reader = BgzfReader(bgzf_file)
+    try:
+        assert reader[start:stop] == data[start:stop]
+    finally:
+        reader.close()
+
+
+def test_gzi_index_matches_block_headers(bgzf_file, data):
+    BgzfReader(bgzf_file).close()
+    assert os.path.exists(bgzf_file + '.gzi')
+
+    compressed, uncompressed = read_gzi(bgzf_file + '.gzi')
+    expected = build_block_index(bgzf_file)
+    assert np.array_equal(compressed, expected[0])
+    assert np.array_equal(uncompressed, expected[1])
+    # One block per BLOCK_DATA_SIZE bytes, then the empty EOF block
+    assert list(uncompressed[:4]) == [0, BLOCK_DATA_SIZE, 2 * BLOCK_DATA_SIZE, 3 * BLOCK_DATA_SIZE]
+    assert uncompressed[-1] == len(data)
+
+    # A second reader uses the saved index
+    reader = BgzfReader(bgzf_file)
+    try:
+        assert reader[0:len(data)] == data
+    finally:
+        reader.close()
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from bgzf import write_bgzf
+from fasta_reader import FastaIndex, build_fai, open_fasta, read_fai, read_fasta
+
+
+def write_fasta(path, records, line_width=60, line_end='\n'):
+    with open(path, 'w', newline='') as f:
+        for name, sequence in records.items():
+            f.write(f'>{name} description{line_end}')
+            for start in range(0, len(sequence), line_width):
+                f.write(sequence[start:start + line_width] + line_end)
+
+
+@pytest.fixture
+def records():
+    rng = np.random.default_rng(1)
+    lengths = {'chr1': 10_000, 'chr2': 60, 'chr3': 1, 'chr4': 12_345}
+    return {name: ''.join(rng.choice(list('ACGTNacgt'), size=length)) for name, length in lengths.items()}
+
+
+@pytest.fixture(params=['plain', 'crlf', 'bgzf'])
+def fasta_file(request, tmp_path, records):
+    path = str(tmp_path / 'genome.fna')
+    write_fasta(path, records, line_end='\r\n' if request.param == 'crlf' else '\n')
+    if request.param == 'bgzf':
+        write_bgzf(path, path + '.gz')
+        return path + '.gz'
+    return path
+
+
+def test_full_read_matches_records(fasta_file, records):
+    sequences = read_fasta(fasta_file)
+    assert sequences.names == list(records)
+    for name, sequence in records.items():
+        assert sequences.fetch(name) == sequence.encode()
+
+
+def test_index_lookups_match_full_read(fasta_file, records):
+    sequences = read_fasta(fasta_file)
+    rng = np.random.default_rng(2)
+    with FastaIndex(fasta_file) as index:
+        assert index.names == sequences.names
+        for name in sequences.names:
+            length = sequences.length(name)
+            assert index.length(name) == length
+            assert index.fetch(name) == sequences.fetch(name)
+            for start, end in rng.integers(0, length + 1, size=(20, 2)):
+                start, end = sorted((int(start), int(end)))
+                assert index.fetch(name, start, end) == sequences.fetch(name, start, end)
+            chunks = list(index.iter_chunks(name, chunk_size=999))
+            assert chunks == list(sequences.iter_chunks(name, chunk_size=999))
+
+
+def test_index_is_saved_and_reused(fasta_file):
+    with FastaIndex(fasta_file) as index:
+        first = index.fetch('chr4', 5000, 6000)
+    assert read_fai(fasta_file + '.fai') == build_fai(fasta_file)
+    with open_fasta(fasta_file) as index:
+        assert index.fetch('chr4', 5000, 6000) == first
+
+
+def test_uneven_line_lengths_are_rejected(tmp_path):
+    path = str(tmp_path / 'bad.fna')
+    with open(path, 'w') as f:
+        f.write('>chr1\nACGT\nACGTACGT\nAC\n')
+    with pytest.raises(ValueError):
+        FastaIndex(path)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image
+
+import image_writer
+from image_writer import OutputSettings, encode_png, render_rgba, save_figure
+
+
+def chart():
+    fig = Figure(figsize=(4, 3), dpi=100)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    x = np.linspace(0, 10, 500)
+    ax.plot(x, np.sin(x), color='tab:blue')
+    ax.bar(np.arange(10), np.arange(10) % 4, color='tab:orange', alpha=0.5)
+    ax.set_title('GC Content (%)')
+    ax.grid(True)
+    return fig
+
+
+def read_png(path):
+    with Image.open(path) as image:
+        return np.asarray(image.convert('RGBA')), image.info.get('dpi')
+
+
+@pytest.mark.parametrize('dpi, compression', [(100, 6), (150, 1), (72, 9)])
+def test_encode_png_matches_savefig(tmp_path, dpi, compression):
+    fig = chart()
+    expected_file = str(tmp_path / 'savefig.png')
+    fig.savefig(expected_file, dpi=dpi)
+    encoded_file = str(tmp_path / 'encoded.png')
+    encode_png(render_rgba(fig, dpi), encoded_file, compression, dpi)
+
+    expected, expected_dpi = read_png(expected_file)
+    encoded, encoded_dpi = read_png(encoded_file)
+    assert encoded.shape == expected.shape
+    assert np.array_equal(encoded, expected)
+    assert encoded_dpi == pytest.approx(expected_dpi, abs=0.01)
+
+
+@pytest.mark.parametrize('writers', [0, 2])
+def test_save_figure_writes_the_same_pixels(tmp_path, writers):
+    fig = chart()
+    expected_file = str(tmp_path / 'savefig.png')
+    fig.savefig(expected_file, dpi=120)
+
+    image_writer.set_writers(writers)
+    try:
+        output_file = save_figure(fig, str(tmp_path / 'chart.png'), OutputSettings(dpi=120))
+        image_writer.flush()
+    finally:
+        image_writer.set_writers(image_writer.DEFAULT_WRITERS)
+    assert np.array_equal(read_png(output_file)[0], read_png(expected_file)[0])